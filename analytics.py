@@ -0,0 +1,174 @@
+"""Données de croissance en colonnes (pandas) et échange des notes au format Parquet
+
+Utilisation : python analytics.py export|import fichier.parquet [dossier_des_données]
+"""
+import argparse
+import datetime
+import sys
+
+import numpy as np
+import pandas as pd
+
+from records import Note
+
+# Colonnes des notes exportées, dans l'ordre
+NOTE_COLUMNS = ('id', 'plantId', 'date', 'content', 'height', 'leaves', 'image')
+
+# Numéro de jour (date.toordinal()) du 1er janvier 1970
+UNIX_EPOCH_DAY = datetime.date(1970, 1, 1).toordinal()
+
+# Nombre de points conservés par série : environ un par pixel de largeur de graphique
+CHART_POINTS = 700
+
+# Nombre total de points envoyés au navigateur pour un graphique à plusieurs séries
+CHART_POINT_BUDGET = 20000
+
+# Au-delà de ce nombre de points affichés, les graphiques passent en rendu WebGL
+WEBGL_THRESHOLD = 2000
+
+
+def growth_frame(measurements):
+    """Table des mesures (une ligne par note mesurée), groupée par plante et triée par date
+
+    Colonnes : id, plantId (catégorie), date (datetime64), height (float32), leaves (entier nullable).
+    """
+    plant_ids = [plant_id for plant_id, points in measurements.items() for _ in points]
+    points = [point for series in measurements.values() for point in series]
+    dates, note_ids, heights, leaves = zip(*points) if points else ((), (), (), ())
+    return pd.DataFrame({
+        'id': pd.Series(note_ids, dtype=object),
+        'plantId': pd.Categorical(plant_ids),
+        'date': pd.to_datetime(pd.Series(dates, dtype=object)),
+        'height': pd.Series(heights, dtype=object).astype('float32'),
+        'leaves': pd.Series(leaves, dtype=object).astype('Int32'),
+    })
+
+
+def between(frame, start=None, end=None):
+    """Lignes dont la date est comprise entre start et end (bornes incluses, None = sans borne)"""
+    mask = np.ones(len(frame), dtype=bool)
+    if start is not None:
+        mask &= (frame['date'] >= pd.Timestamp(start)).to_numpy()
+    if end is not None:
+        mask &= (frame['date'] <= pd.Timestamp(end)).to_numpy()
+    return frame[mask]
+
+
+def height_series(frame, plant_id=None):
+    """Séries de hauteur par plante : {plantId: (dates, hauteurs)}, déjà triées par date"""
+    if plant_id:
+        frame = frame[frame['plantId'] == plant_id]
+    frame = frame[frame['height'].notna()]
+    return {
+        plant_id: (group['date'].to_numpy(), group['height'].to_numpy())
+        for plant_id, group in frame.groupby('plantId', observed=True, sort=False)
+    }
+
+
+def lttb_indices(x, y, threshold=CHART_POINTS):
+    """Indices des points conservés par l'algorithme LTTB (Largest-Triangle-Three-Buckets)
+
+    La série est découpée en paquets ; dans chacun on garde le point qui forme le plus grand
+    triangle avec le point retenu précédemment et la moyenne du paquet suivant. Les extrémités
+    sont toujours conservées.
+    """
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        x = x.astype('int64')
+    x = x.astype('float64')
+    y = np.asarray(y, dtype='float64')
+
+    # Bornes des paquets intermédiaires (le premier et le dernier point ont chacun le leur)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    selected = np.empty(threshold, dtype=int)
+    selected[0] = 0
+    selected[-1] = n - 1
+    previous = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_start, next_end = end, edges[i + 2] if i + 2 < len(edges) else n
+        next_x = x[next_start:next_end].mean()
+        next_y = y[next_start:next_end].mean()
+        # Aire (au facteur 1/2 près) du triangle pour chaque point du paquet
+        areas = np.abs((x[previous] - next_x) * (y[start:end] - y[previous])
+                       - (x[previous] - x[start:end]) * (next_y - y[previous]))
+        previous = start + int(areas.argmax())
+        selected[i + 1] = previous
+    return selected
+
+
+def series_threshold(series_count):
+    """Points conservés par série quand un graphique en superpose plusieurs"""
+    return max(50, min(CHART_POINTS, CHART_POINT_BUDGET // max(1, series_count)))
+
+
+def downsample(dates, values, threshold=CHART_POINTS):
+    """Réduire une série (dates, valeurs) à au plus threshold points en gardant sa forme"""
+    indices = lttb_indices(dates, values, threshold)
+    return dates[indices], values[indices]
+
+
+def notes_frame(notes):
+    """Table complète des notes, prête à être écrite en Parquet"""
+    frame = pd.DataFrame({
+        'id': [note.id for note in notes],
+        'plantId': pd.Categorical([note.plant_id for note in notes]),
+        # Numéros de jour -> dates, sans repasser par le texte
+        'date': pd.to_datetime(np.array([note.day for note in notes], dtype='int64') - UNIX_EPOCH_DAY, unit='D'),
+        'content': [note.content for note in notes],
+        'height': [note.height for note in notes],
+        'leaves': [note.leaves for note in notes],
+        'image': [note.image for note in notes],
+    }, columns=NOTE_COLUMNS)
+    # Hauteurs en double précision : l'export doit restituer exactement les valeurs saisies
+    frame['height'] = pd.to_numeric(frame['height'], errors='coerce').astype('float64')
+    frame['leaves'] = pd.to_numeric(frame['leaves'], errors='coerce').astype('Int32')
+    return frame
+
+
+def export_notes(notes, target):
+    """Écrire les notes en Parquet (chemin ou flux binaire)"""
+    notes_frame(notes).to_parquet(target, engine='pyarrow', compression='zstd', index=False)
+
+
+def import_notes(source):
+    """Relire des notes écrites par export_notes, en enregistrements du journal (records.Note)"""
+    frame = pd.read_parquet(source, engine='pyarrow')
+    frame['plantId'] = frame['plantId'].astype(str)
+    frame['date'] = frame['date'].dt.strftime('%Y-%m-%d')
+    # Les valeurs manquantes redeviennent None, les mesures des nombres Python
+    frame = frame.astype(object).where(frame.notna(), None)
+    return [Note.from_dict(note) for note in frame.to_dict('records')]
+
+
+def main(argv=None):
+    from storage import GardenStore, open_backend
+
+    parser = argparse.ArgumentParser(description="Exporter ou importer les notes au format Parquet")
+    parser.add_argument('action', choices=('export', 'import'))
+    parser.add_argument('path', help="Fichier Parquet")
+    parser.add_argument('data_dir', nargs='?', default='.', help="Dossier des données du jardin")
+    args = parser.parse_args(argv)
+
+    store = GardenStore.load(open_backend(data_dir=args.data_dir))
+    if args.action == 'export':
+        export_notes(store.notes, args.path)
+        print(f"{len(store.notes)} notes exportées vers {args.path}")
+        return 0
+
+    added = 0
+    for note in import_notes(args.path):
+        # Les notes déjà présentes ou rattachées à une plante inconnue sont ignorées
+        if store.get_note(note.id) is None and store.get_plant(note.plant_id):
+            store.add_note(note)
+            added += 1
+    store.flush()
+    print(f"{added} notes importées depuis {args.path}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,16 +1,15 @@
 import streamlit as st
-import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-import plotly.express as px
-import plotly.graph_objects as go
 from datetime import datetime, timedelta
 import uuid
-import json
-import os
-from PIL import Image
 import io
-import base64
+
+from functools import lru_cache, partial
+
+import profiling
+from gardens import DEFAULT_GARDEN, create_garden, garden_dir, list_gardens
+from images import get_rendition, is_blob_ref, publish_rendition, rendition_cache, submit_photo
+from records import Note, Plant, iso_day
+from storage import GardenStore, attach_image, open_backend
 
 # Configuration de la page Streamlit
 st.set_page_config(
@@ -20,34 +19,35 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Profilage optionnel (GARDEN_PROFILE=1 ou ?profile=1 dans l'URL)
+profiler = profiling.Profiler.start(profiling.is_enabled(st.query_params))
+profiler.lap("Initialisation")
+
+# État de session propre au jardin ouvert, oublié quand on change de jardin
+GARDEN_STATE = ('notes_plant_id', 'confirm_delete', 'calendar_day', 'calendar_selected',
+                'notes_parquet', 'page_plants', 'page_journal')
+
 # Fonctions utilitaires
-def load_data():
-    """Charger les données depuis les fichiers JSON"""
-    plants = []
-    notes = []
-    
+@profiling.timed("load_data")
+def load_data(garden=DEFAULT_GARDEN):
+    """Charger les données d'un jardin (instantané partagé par toutes les sessions)
+
+    Renvoie None si le journal est illisible : un journal vide à sa place écraserait les fichiers
+    à la première modification.
+    """
     try:
-        if os.path.exists('garden_plants.json'):
-            with open('garden_plants.json', 'r', encoding='utf-8') as f:
-                plants = json.load(f)
-        
-        if os.path.exists('garden_notes.json'):
-            with open('garden_notes.json', 'r', encoding='utf-8') as f:
-                notes = json.load(f)
+        return GardenStore.open_shared(open_backend(data_dir=garden_dir(garden)))
     except Exception as e:
-        st.error(f"Erreur lors du chargement des données. Création d'un nouveau journal.")
+        st.error("Erreur lors du chargement des données : le journal n'a pas été modifié. "
+                 "Vérifiez ses fichiers puis rechargez la page.")
         print(f"Erreur de chargement: {str(e)}")
-    
-    return plants, notes
+        return None
 
-def save_data(plants, notes):
-    """Sauvegarder les données dans des fichiers JSON"""
+@profiling.timed("save_data")
+def save_data(store):
+    """Sauvegarder les modifications en attente dans les fichiers JSON"""
     try:
-        with open('garden_plants.json', 'w', encoding='utf-8') as f:
-            json.dump(plants, f, ensure_ascii=False, indent=4)
-        
-        with open('garden_notes.json', 'w', encoding='utf-8') as f:
-            json.dump(notes, f, ensure_ascii=False, indent=4)
+        store.flush()
         return True
     except PermissionError:
         st.error("Erreur de permission : l'application n'a pas les droits d'écriture nécessaires.")
@@ -58,23 +58,50 @@ def save_data(plants, notes):
         print(f"Erreur lors de la sauvegarde des données: {str(e)}")
         return False
 
-def format_date(date_string):
-    """Formater une date pour l'affichage"""
-    if isinstance(date_string, str):
-        dt = datetime.strptime(date_string, '%Y-%m-%d')
-        return dt.strftime('%d %B %Y')
-    return ''
+@lru_cache(maxsize=4096)
+def format_day(day):
+    """Formater une date (numéro de jour) pour l'affichage, une seule fois par jour"""
+    return datetime.fromordinal(day).strftime('%d %B %Y')
 
-def get_plant_by_id(plants, plant_id):
-    """Récupérer une plante par son ID"""
-    for plant in plants:
-        if plant['id'] == plant_id:
-            return plant
-    return None
+def turn_page(key, delta):
+    """Changer de page (rappel des boutons : la page est changée avant que les boutons soient dessinés)"""
+    context, page = st.session_state[f"page_{key}"]
+    st.session_state[f"page_{key}"] = (context, max(0, page + delta))
 
-def get_notes_for_plant(notes, plant_id):
-    """Récupérer les notes pour une plante spécifique"""
-    return [note for note in notes if note['plantId'] == plant_id]
+def page_window(key, total, context=None):
+    """Afficher les boutons de pagination et renvoyer la fenêtre visible (début, taille)"""
+    page_size = st.session_state['page_size']
+    page_count = max(1, -(-total // page_size))
+    
+    # La page est conservée entre les exécutions, sauf si le filtre (recherche, plante) change
+    saved_context, page = st.session_state.get(f"page_{key}", (context, 0))
+    if saved_context != context:
+        page = 0
+    page = min(page, page_count - 1)
+    st.session_state[f"page_{key}"] = (context, page)
+    
+    if page_count > 1:
+        cols = st.columns([1, 3, 1])
+        cols[0].button("◀ Précédent", key=f"{key}_prev", disabled=page == 0, use_container_width=True,
+                       on_click=turn_page, args=(key, -1))
+        cols[2].button("Suivant ▶", key=f"{key}_next", disabled=page >= page_count - 1, use_container_width=True,
+                       on_click=turn_page, args=(key, 1))
+        cols[1].caption(f"Page {page + 1} sur {page_count} ({total} éléments)")
+    
+    return page * page_size, page_size
+
+def period_days(period):
+    """Bornes (numéros de jour inclus) d'une période choisie avec st.date_input ; (None, None) sans période"""
+    if not period:
+        return None, None
+    # Une seule date choisie (sélection en cours) : la période se limite à ce jour
+    return period[0].toordinal(), period[-1].toordinal()
+
+def month_bounds(day):
+    """Premier et dernier jour (numéros de jour) du mois contenant day"""
+    first = datetime.fromordinal(day).replace(day=1)
+    next_month = (first + timedelta(days=32)).replace(day=1)
+    return first.toordinal(), next_month.toordinal() - 1
 
 def get_container_name(container_id):
     """Obtenir le nom du contenant"""
@@ -87,288 +114,348 @@ def get_container_name(container_id):
     }
     return containers.get(container_id, container_id)
 
-def days_from_planting(planting_date):
+def days_from_planting(planting_day):
     """Calculer le nombre de jours depuis la plantation"""
-    planted = datetime.strptime(planting_date, '%Y-%m-%d')
-    today = datetime.now()
-    return (today - planted).days
+    return datetime.now().toordinal() - planting_day
 
 def generate_unique_id():
     """Générer un ID unique"""
     return str(uuid.uuid4())
 
-def handle_image_upload(uploaded_file):
-    """Gérer l'upload d'une image et la convertir en base64 avec redimensionnement"""
+@profiling.timed("handle_image_upload")
+def handle_image_upload(uploaded_file, store, collection, record_id):
+    """Confier la photo au pool de traitement ; elle sera rattachée à la fiche une fois prête"""
     if uploaded_file is not None:
-        try:
-            # Ouvrir l'image avec PIL
-            img = Image.open(uploaded_file)
-            
-            # Redimensionner l'image pour réduire sa taille
-            max_size = (800, 800)  # Taille maximale
-            img.thumbnail(max_size, Image.LANCZOS)
-            
-            # Convertir en RGB si nécessaire (pour les images PNG avec transparence)
-            if img.mode in ('RGBA', 'LA'):
-                background = Image.new(img.mode[:-1], img.size, (255, 255, 255))
-                background.paste(img, img.split()[-1])
-                img = background
-            
-            # Sauvegarder dans un buffer avec une qualité réduite
-            buffer = io.BytesIO()
-            img.save(buffer, format="JPEG", quality=85, optimize=True)
-            buffer.seek(0)
-            
-            # Convertir en base64
-            img_str = base64.b64encode(buffer.getvalue()).decode()
-            return f"data:image/jpeg;base64,{img_str}"
-        except Exception as e:
-            st.warning(f"Problème lors du traitement de l'image. L'image ne sera pas enregistrée.")
-            return None
-    return None
-
-def display_image(image_data):
-    """Afficher une image depuis des données base64"""
+        # Le fichier est lu tout de suite : il n'est plus disponible après l'exécution en cours
+        on_ready = partial(attach_image, store.backend, collection, record_id)
+        future = submit_photo(uploaded_file.getvalue(), store.blobs, on_ready)
+        st.session_state.setdefault('pending_photos', []).append(future)
+        return True
+    return False
+
+def confirm_saved(message, photo_queued):
+    """Confirmer un ajout fait dans un fragment
+
+    Si une photo attend son traitement, tout le script est réexécuté pour afficher son suivi dans
+    la barre latérale (un fragment ne la redessine pas) ; le message est alors affiché en haut de page.
+    """
+    if photo_queued:
+        st.session_state['saved_message'] = message
+        st.rerun(scope="app")
+    st.success(message)
+
+@st.fragment(run_every=1)
+def pending_photos_status():
+    """Suivre les photos en cours de traitement et recharger la page quand elles sont prêtes"""
+    pending = st.session_state['pending_photos']
+    remaining = sum(1 for future in pending if not future.done())
+    if remaining:
+        st.caption(f"📷 {remaining} photo(s) en cours de traitement...")
+        return
+    
+    st.session_state['pending_photos'] = []
+    for future in pending:
+        if future.exception():
+            print(f"Erreur de traitement d'image: {str(future.exception())}")
+            st.session_state['photo_error'] = True
+    st.rerun()
+
+@profiling.timed("display_image")
+def display_image(image_data, blobs, rendition='full'):
+    """Afficher une image (vignette ou pleine taille)
+
+    Avec le service de fichiers statiques, la déclinaison est publiée une fois et le navigateur la
+    garde en cache (URL versionnée) ; sinon ses octets sont envoyés à chaque affichage.
+    """
     if image_data:
-        if isinstance(image_data, str) and image_data.startswith('data:'):
-            # Pour les images en base64, extraire les données et le type
-            content_type = image_data.split(';')[0].split(':')[1]
-            image_bytes = base64.b64decode(image_data.split(',')[1])
-            image = Image.open(io.BytesIO(image_bytes))
-            st.image(image, use_container_width=True)
+        if is_blob_ref(image_data) or (isinstance(image_data, str) and image_data.startswith('data:')):
+            try:
+                if st.get_option('server.enableStaticServing'):
+                    st.markdown(f"![]({publish_rendition(image_data, blobs, rendition)})")
+                else:
+                    st.image(get_rendition(image_data, blobs, rendition), use_container_width=True)
+            except (ValueError, IndexError, OSError) as e:
+                # Photo absente ou illisible (ancienne image base64 abîmée) : le reste de la page s'affiche
+                print(f"Erreur d'affichage d'image: {str(e)}")
+                st.caption("📷 Photo illisible")
         else:
             st.image(image_data, use_column_width=True)
 
-# Initialisation de l'état de session
-if 'init' not in st.session_state:
-    st.session_state['init'] = True
-    plants, notes = load_data()
-    st.session_state['plants'] = plants
-    st.session_state['notes'] = notes
-    # Pour gérer la navigation entre sections
-    if 'nav_option' not in st.session_state:
-        st.session_state['nav_option'] = "Tableau de bord"
-else:
-    plants = st.session_state['plants']
-    notes = st.session_state['notes']
+def session_store():
+    """Journal de la session, repris de l'instantané partagé s'il a été modifié ailleurs
 
-# Entête de la page avec style personnalisé
-st.title("Journal de Bord du Jardin")
-st.caption("Suivez toutes vos plantations et leur progression")
-st.divider()
+    Appelée à chaque exécution, complète ou partielle : un fragment réexécuté seul ne doit pas
+    travailler sur le journal capturé lors de la dernière exécution complète.
+    """
+    try:
+        st.session_state['store'] = st.session_state['store'].refresh()
+    except Exception as e:
+        print(f"Erreur de rechargement: {str(e)}")
+    return st.session_state['store']
 
-# Navigation principale
-if 'nav_option' in st.session_state:
-    nav_option = st.session_state['nav_option']
-else:
-    nav_option = st.sidebar.radio(
-        "Navigation",
-        ["Tableau de bord", "Mes Plantes", "Ajouter une Plante", "Notes", "Statistiques"]
-    )
-    st.session_state['nav_option'] = nav_option
+def switch_garden():
+    """Ouvrir le jardin choisi (rappel du sélecteur de jardin)
 
-# Boutons de navigation dans la sidebar (toujours visibles)
-with st.sidebar:
-    st.write("## Navigation")
+    Un jardin ouvert récemment est repris de l'instantané partagé, sans relire ses fichiers.
+    """
+    garden = st.session_state['garden']
+    store = load_data(garden)
+    if store is None:
+        # Journal illisible : la session reste sur le jardin déjà ouvert
+        st.session_state['garden'] = st.session_state['open_garden']
+        return
+    st.session_state['store'] = store
+    st.session_state['open_garden'] = garden
+    # Sélections et pages propres au jardin quitté
+    for key in GARDEN_STATE:
+        st.session_state.pop(key, None)
+    if garden == DEFAULT_GARDEN:
+        st.query_params.pop('garden', None)
+    else:
+        st.query_params['garden'] = garden
+
+def add_garden():
+    """Créer un jardin et l'ouvrir (rappel du bouton « Créer »)"""
+    try:
+        garden = create_garden(st.session_state['new_garden'])
+    except (ValueError, OSError) as e:
+        st.session_state['garden_error'] = str(e)
+        return
+    st.session_state['new_garden'] = ""
+    st.session_state['garden'] = garden
+    switch_garden()
+
+def garden_label(garden):
+    return garden or "Jardin principal"
+
+def go_to(section):
+    """Changer de section (rappel de bouton : la nouvelle page est rendue dès l'exécution suivante)"""
+    st.session_state['nav_option'] = section
+
+def plant_metrics(plant, last_note):
+    """Dernières mesures et âge d'une plante"""
+    if not last_note:
+        return
+    st.write("---")
+    cols = st.columns(3)
+    if last_note.height:
+        cols[0].metric("Hauteur", f"{last_note.height} cm")
+    if last_note.leaves:
+        cols[1].metric("Feuilles", last_note.leaves)
+    cols[2].metric("Âge", f"{days_from_planting(plant.day)} jours")
+
+def note_metrics(note):
+    """Mesures d'une observation"""
+    if note.measured:
+        cols = st.columns([1, 1, 3])
+        if note.height:
+            cols[0].metric("Hauteur", f"{note.height} cm")
+        if note.leaves:
+            cols[1].metric("Feuilles", note.leaves)
+
+def delete_note(note_id):
+    """Supprimer une note (rappel du bouton « Supprimer »)"""
+    store = session_store()
+    store.delete_note(note_id)
+    if save_data(store):
+        st.toast("Note supprimée !")
+
+def shift_month(delta):
+    """Afficher le mois précédent (-1) ou suivant (+1) dans le calendrier des observations"""
+    first, last = month_bounds(st.session_state['calendar_day'])
+    st.session_state['calendar_day'] = first - 1 if delta < 0 else last + 1
+    st.session_state.pop('calendar_selected', None)
+
+def confirm_delete_plant(plant_id):
+    """Demander la confirmation avant de supprimer une plante"""
+    st.session_state['confirm_delete'] = plant_id
+
+def delete_plant(plant_id):
+    """Supprimer une plante et ses notes (rappel du bouton de confirmation)"""
+    st.session_state.pop('confirm_delete', None)
+    store = session_store()
+    plant = store.get_plant(plant_id)
+    if plant is None:
+        return
+    store.delete_plant(plant_id)
+    if save_data(store):
+        st.toast(f"Plante {plant.name} supprimée avec succès !")
+
+def note_entry(store, note):
+    """Observation du journal, avec son bouton de suppression"""
+    plant = store.get_plant(note.plant_id)
+    if not plant:
+        return
     
-    if st.button("Tableau de bord", use_container_width=True):
-        st.session_state['nav_option'] = "Tableau de bord"
-        st.rerun()
-        
-    if st.button("Mes Plantes", use_container_width=True):
-        st.session_state['nav_option'] = "Mes Plantes"
-        st.rerun()
+    with st.container():
+        col1, col2 = st.columns([5, 1])
         
-    if st.button("Ajouter une Plante", use_container_width=True):
-        st.session_state['nav_option'] = "Ajouter une Plante"
-        st.rerun()
+        with col1:
+            st.caption(f"{format_day(note.day)} - {plant.name}")
+            st.write(note.content)
+            
+            if note.image:
+                display_image(note.image, store.blobs)
+            
+            # Afficher les métriques
+            note_metrics(note)
         
-    if st.button("Notes", use_container_width=True):
-        st.session_state['nav_option'] = "Notes"
-        st.rerun()
+        with col2:
+            # Bouton pour supprimer la note (supprimée avant la réexécution du fragment)
+            st.button("Supprimer", key=f"delete_note_{note.id}", on_click=delete_note, args=(note.id,))
         
-    if st.button("Statistiques", use_container_width=True):
-        st.session_state['nav_option'] = "Statistiques"
-        st.rerun()
+        st.divider()
 
-# Section Tableau de bord
-if nav_option == "Tableau de bord":
-    st.header("Tableau de Bord")
+def observation_calendar(store, plant_id):
+    """Calendrier mensuel des observations : seules les notes du mois affiché sont lues"""
+    month_start, month_end = month_bounds(st.session_state.setdefault('calendar_day', datetime.now().toordinal()))
     
-    # Alerte du tableau de bord
-    if len(plants) == 0:
-        st.info("Bienvenue dans votre journal de bord du jardin. Commencez par ajouter vos premières plantations.")
-    else:
-        st.success(f"Vous avez {len(plants)} plantes enregistrées dans votre journal.")
+    # Navigation entre les mois
+    nav = st.columns([1, 4, 1])
+    nav[0].button("◀", key="calendar_prev", on_click=shift_month, args=(-1,), use_container_width=True)
+    nav[1].markdown(f"**{datetime.fromordinal(month_start).strftime('%B %Y').capitalize()}**")
+    nav[2].button("▶", key="calendar_next", on_click=shift_month, args=(1,), use_container_width=True)
     
-    # Plantations récentes
-    st.subheader("Plantations récentes")
+    # Recherche dichotomique dans l'index trié par date : le reste du journal n'est pas parcouru
+    notes = store.recent_notes(plant_id=plant_id or None, start=month_start, end=month_end)
     
-    if len(plants) == 0:
-        st.write("Aucune plante enregistrée pour le moment.")
+    try:
+        from streamlit_calendar import calendar
+    except ImportError:
+        calendar = None
+    
+    if calendar is not None:
+        events = []
+        for note in notes:
+            plant = store.get_plant(note.plant_id)
+            if plant:
+                events.append({'id': note.id, 'title': f"{plant.name} : {note.content[:40]}",
+                               'start': note.date, 'allDay': True})
+        state = calendar(
+            events=events,
+            options={
+                'initialView': 'dayGridMonth',
+                'initialDate': iso_day(month_start),
+                # Le mois est choisi par les boutons ci-dessus, pour ne charger que ses notes
+                'headerToolbar': False,
+                'locale': 'fr',
+                'firstDay': 1,
+                # Dates en UTC : le jour cliqué ne dépend pas du fuseau du navigateur
+                'timeZone': 'UTC',
+            },
+            callbacks=['dateClick', 'eventClick'],
+            key=f"calendar_{month_start}_{plant_id}"
+        )
+        # Jour cliqué (case du jour ou observation)
+        if state.get('callback') == 'dateClick':
+            st.session_state['calendar_selected'] = state['dateClick']['date'][:10]
+        elif state.get('callback') == 'eventClick':
+            st.session_state['calendar_selected'] = state['eventClick']['event']['start'][:10]
+        selected = st.session_state.get('calendar_selected')
     else:
-        # Trier les plantes par date (les plus récentes d'abord)
-        sorted_plants = sorted(plants, key=lambda x: x['date'], reverse=True)
-        recent_plants = sorted_plants[:3]
-        
-        cols = st.columns(min(len(recent_plants), 3))
-        
-        for i, plant in enumerate(recent_plants):
-            with cols[i]:
-                with st.container():
-                    # Créer un expander pour chaque plante
-                    with st.expander(f"{plant['name']} ({plant.get('variety', 'Variété non spécifiée')})", expanded=True):
-                        plant_notes = get_notes_for_plant(notes, plant['id'])
-                        last_note = None
-                        
-                        if plant_notes:
-                            last_note = sorted(plant_notes, key=lambda x: x['date'], reverse=True)[0]
-                        
-                        # Afficher l'image de la plante ou de la dernière note
-                        if 'image' in plant and plant['image']:
-                            display_image(plant['image'])
-                        elif last_note and 'image' in last_note and last_note['image']:
-                            display_image(last_note['image'])
-                        
-                        # Informations principales
-                        st.write(f"**Date de plantation:** {format_date(plant['date'])}")
-                        st.write(f"**Contenant:** {get_container_name(plant['container'])}")
-                        st.write(f"**Terreau:** {plant.get('soil', 'Non spécifié')}")
-                        
-                        # Statistiques de la plante
-                        if last_note:
-                            st.write("---")
-                            stats_cols = st.columns(3)
-                            if 'height' in last_note and last_note['height']:
-                                stats_cols[0].metric("Hauteur", f"{last_note['height']} cm")
-                            if 'leaves' in last_note and last_note['leaves']:
-                                stats_cols[1].metric("Feuilles", last_note['leaves'])
-                            stats_cols[2].metric("Âge", f"{days_from_planting(plant['date'])} jours")
+        # Sans streamlit-calendar : choix parmi les jours du mois qui ont des observations
+        days = sorted({note.day for note in notes})
+        if not days:
+            st.write("Aucune observation ce mois-ci.")
+            return
+        selected_day = st.selectbox("Jour", days, format_func=format_day, key=f"calendar_list_{month_start}")
+        selected = iso_day(selected_day)
     
-    # Notes récentes
-    st.subheader("Dernières notes")
+    if not notes:
+        st.write("Aucune observation ce mois-ci.")
+        return
+    st.caption(f"{len(notes)} observations ce mois-ci")
     
-    if len(notes) == 0:
-        st.write("Aucune note enregistrée pour le moment.")
-    else:
-        # Trier les notes par date (les plus récentes d'abord)
-        sorted_notes = sorted(notes, key=lambda x: x['date'], reverse=True)
-        recent_notes = sorted_notes[:5]
-        
-        for note in recent_notes:
-            plant = get_plant_by_id(plants, note['plantId'])
-            if not plant:
-                continue
-            
-            with st.container():
-                st.caption(f"{format_date(note['date'])} - {plant['name']}")
-                st.write(note['content'])
-                
-                if 'image' in note and note['image']:
-                    display_image(note['image'])
-                
-                # Afficher les métriques
-                if 'height' in note and note['height'] or 'leaves' in note and note['leaves']:
-                    cols = st.columns([1, 1, 3])
-                    if 'height' in note and note['height']:
-                        cols[0].metric("Hauteur", f"{note['height']} cm")
-                    if 'leaves' in note and note['leaves']:
-                        cols[1].metric("Feuilles", note['leaves'])
-                
-                st.divider()
+    # Observations du jour choisi
+    if selected:
+        for note in notes:
+            if note.date == selected:
+                note_entry(store, note)
 
-# Section Liste des Plantes
-elif nav_option == "Mes Plantes":
-    st.header("Mes Plantes")
+# Fragments : chaque interaction ne réexécute que le fragment qui la contient, pas tout le script
+@st.fragment
+@profiling.timed_fragment("fragment.plant_grid", st.query_params)
+def plant_grid():
+    """Recherche, pagination et cartes des plantes"""
+    store = session_store()
     
     # Barre de recherche
     search_term = st.text_input("Rechercher une plante...", "")
     
-    # Filtrer les plantes en fonction de la recherche
-    filtered_plants = plants
+    # Filtrer les plantes en fonction de la recherche (nom, variété, terreau, emplacement, notes)
+    filtered_plants = store.plants
     if search_term:
-        filtered_plants = [
-            plant for plant in plants
-            if search_term.lower() in plant['name'].lower() or
-               (plant.get('variety', "") and search_term.lower() in plant['variety'].lower())
-        ]
+        filtered_plants = store.search_plants(search_term)
     
     if not filtered_plants:
         st.write("Aucune plante trouvée.")
-    else:
-        # Afficher les plantes en grille (2 colonnes)
-        for i in range(0, len(filtered_plants), 2):
-            cols = st.columns(2)
-            
-            for j in range(2):
-                if i + j < len(filtered_plants):
-                    plant = filtered_plants[i + j]
-                    
-                    with cols[j]:
-                        with st.container():
-                            # En-tête avec fond coloré
-                            st.subheader(f"{plant['name']} ({plant.get('variety', 'Variété non spécifiée')})")
-                            
-                            plant_notes = get_notes_for_plant(notes, plant['id'])
-                            last_note = None
-                            
-                            if plant_notes:
-                                last_note = sorted(plant_notes, key=lambda x: x['date'], reverse=True)[0]
-                            
-                            # Afficher l'image
-                            if 'image' in plant and plant['image']:
-                                display_image(plant['image'])
-                            elif last_note and 'image' in last_note and last_note['image']:
-                                display_image(last_note['image'])
-                            
-                            # Informations de la plante
-                            st.write(f"**Date de plantation:** {format_date(plant['date'])}")
-                            st.write(f"**Contenant:** {get_container_name(plant['container'])}")
-                            st.write(f"**Terreau:** {plant.get('soil', 'Non spécifié')}")
-                            st.write(f"**Emplacement:** {plant.get('location', 'Non spécifié')}")
-                            
-                            if plant.get('notes'):
-                                st.write(f"**Notes:** {plant['notes']}")
-                            
-                            # Statistiques
-                            if last_note:
-                                st.write("---")
-                                stat_cols = st.columns(3)
-                                if 'height' in last_note and last_note['height']:
-                                    stat_cols[0].metric("Hauteur", f"{last_note['height']} cm")
-                                if 'leaves' in last_note and last_note['leaves']:
-                                    stat_cols[1].metric("Feuilles", last_note['leaves'])
-                                stat_cols[2].metric("Âge", f"{days_from_planting(plant['date'])} jours")
-                            
-                            # Boutons d'action
-                            action_cols = st.columns(2)
-                            
-                            # Bouton pour ajouter une note
-                            if action_cols[0].button(f"Ajouter une note", key=f"add_note_{plant['id']}"):
-                                st.session_state['selected_plant_id'] = plant['id']
-                                st.session_state['nav_option'] = "Notes"
-                                st.rerun()
-                            
-                            # Bouton pour supprimer la plante
-                            if action_cols[1].button(f"Supprimer", key=f"delete_{plant['id']}"):
-                                # Demander confirmation
-                                confirm = st.checkbox(f"Confirmer la suppression de {plant['name']}", key=f"confirm_{plant['id']}")
-                                
-                                if confirm:
-                                    # Supprimer les notes associées
-                                    st.session_state['notes'] = [note for note in notes if note['plantId'] != plant['id']]
-                                    # Supprimer la plante
-                                    st.session_state['plants'] = [p for p in plants if p['id'] != plant['id']]
-                                    # Sauvegarder les données
-                                    save_data(st.session_state['plants'], st.session_state['notes'])
-                                    st.success(f"Plante {plant['name']} supprimée avec succès !")
-                                    st.rerun()
-                            
-                            st.divider()
+        return
+    
+    # Seule la page visible est construite
+    start, size = page_window('plants', len(filtered_plants), search_term)
+    visible_plants = filtered_plants[start:start + size]
+    
+    # Afficher les plantes en grille (2 colonnes)
+    for i in range(0, len(visible_plants), 2):
+        cols = st.columns(2)
+        
+        for j in range(2):
+            if i + j < len(visible_plants):
+                plant = visible_plants[i + j]
+                
+                with cols[j]:
+                    with st.container():
+                        # En-tête avec fond coloré
+                        st.subheader(f"{plant.name} ({plant.variety or 'Variété non spécifiée'})")
+                        
+                        last_note = store.latest_note(plant.id)
+                        
+                        # Afficher l'image
+                        if plant.image:
+                            display_image(plant.image, store.blobs, 'thumb')
+                        elif last_note and last_note.image:
+                            display_image(last_note.image, store.blobs, 'thumb')
+                        
+                        # Informations de la plante
+                        st.write(f"**Date de plantation:** {format_day(plant.day)}")
+                        st.write(f"**Contenant:** {get_container_name(plant.container)}")
+                        st.write(f"**Terreau:** {plant.soil or 'Non spécifié'}")
+                        st.write(f"**Emplacement:** {plant.location or 'Non spécifié'}")
+                        
+                        if plant.notes:
+                            st.write(f"**Notes:** {plant.notes}")
+                        
+                        # Statistiques
+                        plant_metrics(plant, last_note)
+                        
+                        # Boutons d'action
+                        action_cols = st.columns(2)
+                        
+                        # Bouton pour ajouter une note (changement de page : tout le script est réexécuté)
+                        if action_cols[0].button(f"Ajouter une note", key=f"add_note_{plant.id}"):
+                            st.session_state['notes_plant_id'] = plant.id
+                            go_to("Notes")
+                            st.rerun()
+                        
+                        # Bouton pour supprimer la plante, après confirmation
+                        if st.session_state.get('confirm_delete') == plant.id:
+                            st.warning(f"Supprimer {plant.name} et toutes ses notes ?")
+                            confirm_cols = st.columns(2)
+                            confirm_cols[0].button("Confirmer", key=f"confirm_{plant.id}",
+                                                   on_click=delete_plant, args=(plant.id,))
+                            confirm_cols[1].button("Annuler", key=f"cancel_{plant.id}",
+                                                   on_click=st.session_state.pop, args=('confirm_delete', None))
+                        else:
+                            action_cols[1].button(f"Supprimer", key=f"delete_{plant.id}",
+                                                  on_click=confirm_delete_plant, args=(plant.id,))
+                        
+                        st.divider()
 
-# Section Ajouter une Plante
-elif nav_option == "Ajouter une Plante":
-    st.header("Ajouter une Nouvelle Plante")
+@st.fragment
+@profiling.timed_fragment("fragment.plant_form", st.query_params)
+def plant_form():
+    """Formulaire d'ajout d'une plante"""
+    store = session_store()
     
     with st.form("plant_form"):
         # Champs du formulaire
@@ -398,70 +485,50 @@ elif nav_option == "Ajouter une Plante":
             if not name:
                 st.error("Le nom de la plante est obligatoire.")
             else:
-                # Convertir la date en string
-                date_str = date.strftime('%Y-%m-%d')
+                # Créer l'objet plante (la photo est rattachée dès qu'elle est traitée)
+                plant = Plant(
+                    id=generate_unique_id(),
+                    name=name,
+                    day=date.toordinal(),
+                    variety=variety,
+                    container=container,
+                    soil=soil,
+                    location=location,
+                    notes=plant_notes,
+                )
                 
-                # Gérer l'image
-                image = handle_image_upload(uploaded_file)
-                
-                # Créer l'objet plante
-                plant = {
-                    'id': generate_unique_id(),
-                    'name': name,
-                    'variety': variety,
-                    'container': container,
-                    'soil': soil,
-                    'date': date_str,
-                    'location': location,
-                    'notes': plant_notes,
-                    'image': image
-                }
-            
-                # Ajouter la plante à la liste
-                st.session_state['plants'].append(plant)
+                # Ajouter la plante au journal
+                store.add_plant(plant)
                 
                 # Sauvegarder les données
-                save_data(st.session_state['plants'], st.session_state['notes'])
+                save_data(store)
                 
-                st.success(f"Plante {name} ajoutée avec succès !")
-            
-            # Option pour ajouter une autre plante ou retourner à la liste
-            if st.button("Voir la liste des plantes"):
-                st.session_state['nav_option'] = "Mes Plantes"
-                st.experimental_rerun()
+                # Gérer l'image en arrière-plan
+                photo_queued = handle_image_upload(uploaded_file, store, 'plants', plant.id)
+                
+                confirm_saved(f"Plante {name} ajoutée avec succès !", photo_queued)
 
-# Section Notes
-elif nav_option == "Notes":
-    st.header("Notes et Observations")
-    
-    # Sélecteur de plante
-    plant_options = [(p['id'], f"{p['name']} ({p.get('variety', 'Variété non spécifiée')})") for p in plants]
-    plant_options.insert(0, ("", "Toutes les plantes"))
+@st.fragment
+@profiling.timed_fragment("fragment.observations", st.query_params)
+def observations(plant_id):
+    """Fiche de la plante choisie, formulaire d'observation, import et journal des observations
+
+    Ajouter, importer ou supprimer une note ne réexécute que ce fragment : la fiche et le journal
+    sont rendus après la modification, dans la même exécution.
+    """
+    store = session_store()
+    plant = store.get_plant(plant_id) if plant_id else None
     
-    # Si une plante a été sélectionnée depuis une autre page
-    default_plant_index = 0
-    if 'selected_plant_id' in st.session_state:
-        for i, (p_id, _) in enumerate(plant_options):
-            if p_id == st.session_state['selected_plant_id']:
-                default_plant_index = i
-                # Réinitialiser la sélection pour les futurs chargements
-                st.session_state.pop('selected_plant_id', None)
-                break
-    
-    selected_plant_id = st.selectbox(
-        "Sélectionner une plante",
-        options=[p[0] for p in plant_options],
-        format_func=lambda x: next((p[1] for p in plant_options if p[0] == x), ""),
-        index=default_plant_index
-    )
+    # Fiche de la plante sélectionnée : emplacement réservé, remplie après le formulaire et l'import
+    card = st.container()
     
     # Formulaire pour ajouter une nouvelle note
     st.subheader("Ajouter une observation")
     
     # Vérifier si une plante est sélectionnée pour le formulaire
-    if not plants:
+    if not store.plants:
         st.warning("Ajoutez d'abord une plante avant de pouvoir ajouter des notes.")
-    elif not selected_plant_id:
+    elif not plant:
         st.info("Sélectionnez une plante pour ajouter une note.")
     else:
         with st.form("note_form"):
@@ -486,264 +553,492 @@ elif nav_option == "Notes":
                 if not content:
                     st.error("L'observation est obligatoire.")
                 else:
-                    # Convertir la date en string
-                    date_str = date.strftime('%Y-%m-%d')
-                    
-                    # Gérer l'image
-                    image = handle_image_upload(uploaded_file)
+                    # Créer l'objet note (la photo est rattachée dès qu'elle est traitée)
+                    note = Note(
+                        id=generate_unique_id(),
+                        plant_id=plant.id,
+                        day=date.toordinal(),
+                        content=content,
+                        height=float(height) if height > 0 else None,
+                        leaves=int(leaves) if leaves > 0 else None,
+                    )
                     
-                    # Créer l'objet note
-                    note = {
-                        'id': generate_unique_id(),
-                        'plantId': selected_plant_id,
-                        'date': date_str,
-                        'content': content,
-                        'height': height if height > 0 else None,
-                        'leaves': leaves if leaves > 0 else None,
-                        'image': image
-                    }
-                
-                    # Ajouter la note à la liste
-                    st.session_state['notes'].append(note)
+                    # Ajouter la note au journal
+                    store.add_note(note)
                     
                     # Sauvegarder les données
-                    save_data(st.session_state['plants'], st.session_state['notes'])
+                    save_data(store)
                     
-                    st.success("Note ajoutée avec succès !")
-                
-                # Recharger la page pour afficher la nouvelle note
-                st.experimental_rerun()
+                    # Gérer l'image en arrière-plan
+                    photo_queued = handle_image_upload(uploaded_file, store, 'notes', note.id)
+                    
+                    confirm_saved("Note ajoutée avec succès !", photo_queued)
+    
+    # Import en masse des relevés (enregistreurs, tableurs)
+    if store.plants:
+        with st.expander("Importer des mesures (CSV / JSON-lines)"):
+            st.caption("Colonnes : plantId, date, height, leaves, content. "
+                       "Une seule mesure est gardée par plante et par jour.")
+            import_file = st.file_uploader("Fichier de mesures", type=["csv", "jsonl", "json"], key="import_file")
+            if import_file and st.button("Importer"):
+                from importer import import_measurements
+                try:
+                    st.success(import_measurements(store, import_file).summary())
+                except (ValueError, KeyError) as e:
+                    st.error(f"Fichier de mesures illisible : {str(e)}")
+    
+    # Dernières mesures, y compris celles ajoutées ou importées dans cette exécution
+    if plant:
+        with card:
+            plant_metrics(plant, store.latest_note(plant.id))
     
     # Journal d'Observations
     st.subheader("Journal d'Observations")
     
-    # Filtrer les notes par plante si une plante est sélectionnée
-    filtered_notes = notes
-    if selected_plant_id:
-        filtered_notes = [note for note in notes if note['plantId'] == selected_plant_id]
+    # Affichage en liste ou en calendrier mensuel
+    if st.radio("Affichage", ["Liste", "Calendrier"], horizontal=True, key="notes_view") == "Calendrier":
+        observation_calendar(store, plant_id)
+        return
+    
+    filter_cols = st.columns([3, 2])
+    
+    # Recherche dans le texte des observations
+    notes_query = filter_cols[0].text_input("Rechercher dans les observations...", "")
     
-    # Trier les notes par date (les plus récentes d'abord)
-    filtered_notes = sorted(filtered_notes, key=lambda x: x['date'], reverse=True)
+    # Période (un jour, ou du … au …) : trouvée par recherche dichotomique dans l'index des dates
+    period = filter_cols[1].date_input("Période", value=(), format="DD/MM/YYYY", key="notes_period")
+    window_start, window_end = period_days(period)
     
-    if not filtered_notes:
+    # Notes de la plante sélectionnée (ou de toutes), les plus récentes d'abord
+    if notes_query:
+        matching_notes = store.search_notes(notes_query, plant_id=plant_id or None,
+                                            start=window_start, end=window_end)
+        total_notes = len(matching_notes)
+    else:
+        total_notes = store.count_notes(plant_id=plant_id or None, start=window_start, end=window_end)
+    
+    if not total_notes:
         st.write("Aucune note trouvée.")
+        return
+    
+    # Seules les notes de la page visible sont lues et affichées
+    start, size = page_window('journal', total_notes, (plant_id, notes_query, window_start, window_end))
+    if notes_query:
+        visible_notes = matching_notes[start:start + size]
     else:
-        for note in filtered_notes:
-            plant = get_plant_by_id(plants, note['plantId'])
-            if not plant:
-                continue
+        visible_notes = store.recent_notes(size, plant_id=plant_id or None, offset=start,
+                                           start=window_start, end=window_end)
+    
+    for note in visible_notes:
+        note_entry(store, note)
+
+@st.fragment
+@profiling.timed_fragment("fragment.growth_charts", st.query_params)
+def growth_charts():
+    """Graphiques de la page Statistiques : choisir une plante ou une période ne réexécute qu'eux"""
+    # pandas et plotly ne sont chargés qu'à la première visite de cette page (puis restent en mémoire)
+    import pandas as pd
+    import plotly.express as px
+    import plotly.graph_objects as go
+    from analytics import WEBGL_THRESHOLD, between, downsample, height_series, lttb_indices, series_threshold
+    
+    store = session_store()
+    
+    # Sélecteur de plante
+    plant_options = [(p.id, f"{p.name} ({p.variety or 'Variété non spécifiée'})") for p in store.plants]
+    plant_options.insert(0, ("", "Toutes les plantes"))
+    plant_labels = dict(plant_options)
+    
+    selected_plant_id = st.selectbox(
+        "Sélectionner une plante",
+        options=[p[0] for p in plant_options],
+        format_func=plant_labels.get
+    )
+    
+    # Agrégats précalculés : aucune lecture du journal complet
+    stats = store.stats
+    # Mesures en colonnes, groupées par plante et triées par date
+    growth = stats.frame
+    
+    # Zoom sur une période : les séries sont réduites sur la fenêtre choisie, donc plus détaillées
+    if len(growth):
+        first_day, last_day = growth['date'].min().date(), growth['date'].max().date()
+        if first_day < last_day:
+            date_range = st.slider(
+                "Période affichée",
+                min_value=first_day,
+                max_value=last_day,
+                value=(first_day, last_day),
+                format="DD/MM/YYYY"
+            )
+            growth = between(growth, *date_range)
             
-            with st.container():
-                col1, col2 = st.columns([5, 1])
+            # Nombre d'observations de la période, compté dans l'index des dates sans lire les notes
+            observed = store.count_notes(selected_plant_id or None, date_range[0].toordinal(), date_range[1].toordinal())
+            st.caption(f"{observed} observations entre le {format_day(date_range[0].toordinal())} "
+                       f"et le {format_day(date_range[1].toordinal())}")
+    
+    # Séries réduites à environ un point par pixel de graphique
+    series = height_series(growth, selected_plant_id or None)
+    threshold = series_threshold(len(series))
+    series = {plant_id: downsample(dates, heights, threshold) for plant_id, (dates, heights) in series.items()}
+    
+    # Mise en page deux colonnes pour les graphiques
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        st.subheader("Croissance des Plantes")
+        
+        # Préparer les données pour le graphique de croissance
+        if selected_plant_id:
+            # Si une plante spécifique est sélectionnée
+            if selected_plant_id in series:
+                dates, heights = series[selected_plant_id]
                 
-                with col1:
-                    st.caption(f"{format_date(note['date'])} - {plant['name']}")
-                    st.write(note['content'])
-                    
-                    if 'image' in note and note['image']:
-                        display_image(note['image'])
-                    
-                    # Afficher les métriques
-                    if 'height' in note and note['height'] or 'leaves' in note and note['leaves']:
-                        metric_cols = st.columns([1, 1, 3])
-                        if 'height' in note and note['height']:
-                            metric_cols[0].metric("Hauteur", f"{note['height']} cm")
-                        if 'leaves' in note and note['leaves']:
-                            metric_cols[1].metric("Feuilles", note['leaves'])
+                # Créer le graphique avec Plotly
+                fig = px.line(x=dates, y=heights, markers=True,
+                              labels={'x': 'Date', 'y': 'Hauteur (cm)'},
+                              title="Évolution de la hauteur",
+                              render_mode='webgl' if len(dates) > WEBGL_THRESHOLD else 'svg')
+                st.plotly_chart(fig, use_container_width=True)
+            else:
+                st.info("Pas de données de hauteur pour cette plante.")
+        else:
+            # Toutes les plantes avec données de hauteur (séries déjà triées par date)
+            fig = go.Figure()
+            # Rendu WebGL au-delà d'un certain nombre de points
+            total_points = sum(len(dates) for dates, _ in series.values())
+            scatter = go.Scattergl if total_points > WEBGL_THRESHOLD else go.Scatter
+            
+            for plant_id, (dates, heights) in series.items():
+                plant = store.get_plant(plant_id)
+                if not plant:
+                    continue
                 
-                with col2:
-                    # Bouton pour supprimer la note
-                    if st.button("Supprimer", key=f"delete_note_{note['id']}"):
-                        st.session_state['notes'] = [n for n in notes if n['id'] != note['id']]
-                        save_data(st.session_state['plants'], st.session_state['notes'])
-                        st.success("Note supprimée !")
-                        st.rerun()
+                fig.add_trace(scatter(
+                    x=dates,
+                    y=heights,
+                    mode='lines+markers',
+                    name=plant.name
+                ))
+            
+            if fig.data:
+                fig.update_layout(
+                    title="Évolution de la hauteur par plante",
+                    xaxis_title="Date",
+                    yaxis_title="Hauteur (cm)"
+                )
                 
-                st.divider()
-
-# Section Statistiques
-elif nav_option == "Statistiques":
-    st.header("Statistiques et Progrès")
+                st.plotly_chart(fig, use_container_width=True)
+            else:
+                st.info("Pas de données de hauteur disponibles.")
     
-    if not plants:
-        st.warning("Ajoutez des plantes pour voir les statistiques.")
-    else:
-        # Sélecteur de plante
-        plant_options = [(p['id'], f"{p['name']} ({p.get('variety', 'Variété non spécifiée')})") for p in plants]
-        plant_options.insert(0, ("", "Toutes les plantes"))
-        
-        selected_plant_id = st.selectbox(
-            "Sélectionner une plante",
-            options=[p[0] for p in plant_options],
-            format_func=lambda x: next((p[1] for p in plant_options if p[0] == x), "")
-        )
-        
-        # Filtrer les notes en fonction de la plante sélectionnée
-        filtered_notes = notes
+    with col2:
         if selected_plant_id:
-            filtered_notes = [note for note in notes if note['plantId'] == selected_plant_id]
-        
-        # Mise en page deux colonnes pour les graphiques
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            st.subheader("Croissance des Plantes")
+            st.subheader("Évolution de la plante")
             
-            # Préparer les données pour le graphique de croissance
-            if selected_plant_id:
-                # Si une plante spécifique est sélectionnée
-                plant_notes = [note for note in filtered_notes if 'height' in note and note['height']]
+            # Mesures de la plante sélectionnée, triées par date
+            plant_growth = growth[growth['plantId'] == selected_plant_id]
+            
+            if len(plant_growth):
+                # Au plus une barre par pixel, choisies d'après la courbe de hauteur
+                plant_growth = plant_growth.iloc[lttb_indices(
+                    plant_growth['date'].to_numpy(),
+                    plant_growth['height'].fillna(0).to_numpy()
+                )]
+                df = pd.DataFrame({
+                    'date': plant_growth['date'].dt.strftime('%d %B %Y'),
+                    'height': plant_growth['height'].fillna(0),
+                    'leaves': plant_growth['leaves'].fillna(0)
+                })
                 
-                if plant_notes:
-                    # Trier par date
-                    plant_notes.sort(key=lambda x: x['date'])
-                    
-                    # Créer un DataFrame pour le graphique
-                    df = pd.DataFrame({
-                        'date': [note['date'] for note in plant_notes],
-                        'height': [note['height'] for note in plant_notes]
-                    })
-                    
-                    # Convertir les dates en datetime
-                    df['date'] = pd.to_datetime(df['date'])
-                    
-                    # Créer le graphique avec Plotly
-                    fig = px.line(df, x='date', y='height', markers=True,
-                                  labels={'date': 'Date', 'height': 'Hauteur (cm)'},
-                                  title="Évolution de la hauteur")
-                    st.plotly_chart(fig, use_container_width=True)
-                else:
-                    st.info("Pas de données de hauteur pour cette plante.")
+                # Créer le graphique avec Plotly
+                fig = px.bar(
+                    df,
+                    x='date',
+                    y=['height', 'leaves'],
+                    barmode='group',
+                    labels={'date': 'Date', 'value': 'Valeur', 'variable': 'Mesure'},
+                    title="Évolution de la hauteur et du nombre de feuilles"
+                )
+                
+                # Personnaliser les noms des séries
+                fig.update_layout(
+                    legend=dict(
+                        title="",
+                        orientation="h",
+                        yanchor="bottom",
+                        y=1.02,
+                        xanchor="right",
+                        x=1
+                    )
+                )
+                
+                # Renommer les séries
+                newnames = {'height': 'Hauteur (cm)', 'leaves': 'Nombre de feuilles'}
+                fig.for_each_trace(lambda t: t.update(name = newnames[t.name]))
+                
+                st.plotly_chart(fig, use_container_width=True)
             else:
-                # Toutes les plantes avec données de hauteur
-                plants_with_height = {}
+                st.info("Pas assez de données pour cette plante.")
+        else:
+            st.subheader("Distribution par Type")
+            
+            if stats.varieties:
+                # Créer un DataFrame pour le graphique
+                df = pd.DataFrame({
+                    'Variété': list(stats.varieties.keys()),
+                    'Nombre': list(stats.varieties.values())
+                })
                 
-                for note in filtered_notes:
-                    if 'height' in note and note['height']:
-                        plant = get_plant_by_id(plants, note['plantId'])
-                        if not plant:
-                            continue
-                        
-                        plant_name = plant['name']
+                # Créer le graphique
+                fig = px.pie(df, values='Nombre', names='Variété', title="Distribution des variétés")
+                fig.update_traces(textposition='inside', textinfo='percent+label')
+                
+                st.plotly_chart(fig, use_container_width=True)
+            else:
+                st.info("Pas de données de variété disponibles.")
+            
+            if stats.containers:
+                df = pd.DataFrame({
+                    'Contenant': [get_container_name(c) or 'Non spécifié' for c in stats.containers],
+                    'Nombre': list(stats.containers.values())
+                })
+                fig = px.bar(df, x='Contenant', y='Nombre', title="Plantes par contenant")
+                st.plotly_chart(fig, use_container_width=True)
+
+@st.fragment
+def parquet_export():
+    """Export des notes en Parquet, sans reconstruire les graphiques"""
+    from analytics import export_notes
+    
+    store = session_store()
+    
+    # Export des notes en Parquet (préparé à la demande : il lit tout le journal)
+    if st.button("Préparer l'export Parquet des notes"):
+        buffer = io.BytesIO()
+        export_notes(store.notes, buffer)
+        st.session_state['notes_parquet'] = buffer.getvalue()
+    if 'notes_parquet' in st.session_state:
+        st.download_button(
+            "Télécharger les notes (Parquet)",
+            data=st.session_state['notes_parquet'],
+            file_name="garden_notes.parquet",
+            mime="application/vnd.apache.parquet"
+        )
+
+# Initialisation de l'état de session
+if 'init' not in st.session_state:
+    # Jardin demandé dans l'URL (?garden=parcelle-12), le jardin principal sinon
+    garden = st.query_params.get('garden', DEFAULT_GARDEN)
+    if garden not in list_gardens():
+        garden = DEFAULT_GARDEN
+    initial_store = load_data(garden)
+    if initial_store is None:
+        # Rien ne doit pouvoir écraser un journal illisible : nouvel essai à la prochaine exécution
+        st.stop()
+    st.session_state['init'] = True
+    st.session_state['garden'] = st.session_state['open_garden'] = garden
+    st.session_state['store'] = initial_store
+    # Pour gérer la navigation entre sections
+    if 'nav_option' not in st.session_state:
+        st.session_state['nav_option'] = "Tableau de bord"
+    # Nombre de plantes ou de notes affichées par page
+    st.session_state['page_size'] = 10
+
+# Reprendre les données partagées si le journal a été modifié ailleurs
+store = session_store()
+plants = store.plants
+
+profiler.lap("Navigation")
+
+# Entête de la page avec style personnalisé
+st.title("Journal de Bord du Jardin")
+st.caption("Suivez toutes vos plantations et leur progression")
+st.divider()
+
+# Navigation principale
+if 'nav_option' in st.session_state:
+    nav_option = st.session_state['nav_option']
+else:
+    nav_option = st.sidebar.radio(
+        "Navigation",
+        ["Tableau de bord", "Mes Plantes", "Ajouter une Plante", "Notes", "Statistiques"]
+    )
+    st.session_state['nav_option'] = nav_option
+
+# Boutons de navigation dans la sidebar (toujours visibles)
+with st.sidebar:
+    st.write("## Jardin")
+    
+    st.selectbox("Jardin", list_gardens(), format_func=garden_label, key='garden',
+                 on_change=switch_garden, label_visibility="collapsed")
+    with st.expander("Nouveau jardin"):
+        st.text_input("Nom du jardin", key='new_garden', placeholder="Parcelle 12")
+        st.button("Créer", on_click=add_garden)
+        if 'garden_error' in st.session_state:
+            st.error(st.session_state.pop('garden_error'))
+    
+    st.write("## Navigation")
+    
+    # Le rappel change de section avant l'exécution déclenchée par le clic : pas de st.rerun()
+    for section in ["Tableau de bord", "Mes Plantes", "Ajouter une Plante", "Notes", "Statistiques"]:
+        st.button(section, use_container_width=True, on_click=go_to, args=(section,))
+    
+    st.selectbox("Éléments par page", [4, 10, 20, 50], key='page_size')
+    
+    # Photos envoyées encore en cours de traitement
+    if st.session_state.get('pending_photos'):
+        pending_photos_status()
+
+if 'saved_message' in st.session_state:
+    st.success(st.session_state.pop('saved_message'))
+
+if st.session_state.pop('photo_error', False):
+    st.warning("Problème lors du traitement de l'image. L'image ne sera pas enregistrée.")
+
+profiler.lap(f"Page : {nav_option}")
+
+# Section Tableau de bord
+if nav_option == "Tableau de bord":
+    st.header("Tableau de Bord")
+    
+    # Alerte du tableau de bord
+    if len(plants) == 0:
+        st.info("Bienvenue dans votre journal de bord du jardin. Commencez par ajouter vos premières plantations.")
+    else:
+        st.success(f"Vous avez {len(plants)} plantes enregistrées dans votre journal.")
+    
+    # Plantations récentes
+    st.subheader("Plantations récentes")
+    
+    if len(plants) == 0:
+        st.write("Aucune plante enregistrée pour le moment.")
+    else:
+        # Les plantes les plus récentes d'abord
+        recent_plants = store.recent_plants(3)
+        
+        cols = st.columns(min(len(recent_plants), 3))
+        
+        for i, plant in enumerate(recent_plants):
+            with cols[i]:
+                with st.container():
+                    # Créer un expander pour chaque plante
+                    with st.expander(f"{plant.name} ({plant.variety or 'Variété non spécifiée'})", expanded=True):
+                        last_note = store.latest_note(plant.id)
                         
-                        if plant_name not in plants_with_height:
-                            plants_with_height[plant_name] = {'dates': [], 'heights': []}
+                        # Afficher l'image de la plante ou de la dernière note
+                        if plant.image:
+                            display_image(plant.image, store.blobs, 'thumb')
+                        elif last_note and last_note.image:
+                            display_image(last_note.image, store.blobs, 'thumb')
                         
-                        plants_with_height[plant_name]['dates'].append(note['date'])
-                        plants_with_height[plant_name]['heights'].append(note['height'])
-                
-                if plants_with_height:
-                    fig = go.Figure()
-                    
-                    for plant_name, data in plants_with_height.items():
-                        # Trier les données par date
-                        sorted_data = sorted(zip(data['dates'], data['heights']), key=lambda x: x[0])
-                        dates = [item[0] for item in sorted_data]
-                        heights = [item[1] for item in sorted_data]
+                        # Informations principales
+                        st.write(f"**Date de plantation:** {format_day(plant.day)}")
+                        st.write(f"**Contenant:** {get_container_name(plant.container)}")
+                        st.write(f"**Terreau:** {plant.soil or 'Non spécifié'}")
                         
-                        fig.add_trace(go.Scatter(
-                            x=dates,
-                            y=heights,
-                            mode='lines+markers',
-                            name=plant_name
-                        ))
-                    
-                    fig.update_layout(
-                        title="Évolution de la hauteur par plante",
-                        xaxis_title="Date",
-                        yaxis_title="Hauteur (cm)"
-                    )
-                    
-                    st.plotly_chart(fig, use_container_width=True)
-                else:
-                    st.info("Pas de données de hauteur disponibles.")
-        
-        with col2:
-            if selected_plant_id:
-                st.subheader("Évolution de la plante")
-                
-                # Données pour la plante sélectionnée
-                plant_notes = get_notes_for_plant(notes, selected_plant_id)
+                        # Statistiques de la plante
+                        plant_metrics(plant, last_note)
+    
+    # Notes récentes
+    st.subheader("Dernières notes")
+    
+    # Seules les 5 notes les plus récentes sont lues
+    recent_notes = store.recent_notes(5)
+    
+    if not recent_notes:
+        st.write("Aucune note enregistrée pour le moment.")
+    else:
+        for note in recent_notes:
+            plant = store.get_plant(note.plant_id)
+            if not plant:
+                continue
+            
+            with st.container():
+                st.caption(f"{format_day(note.day)} - {plant.name}")
+                st.write(note.content)
                 
-                if plant_notes and any(('height' in note or 'leaves' in note) for note in plant_notes):
-                    # Trier par date
-                    plant_notes.sort(key=lambda x: x['date'])
-                    
-                    # Préparer les données
-                    dates = [note['date'] for note in plant_notes]
-                    heights = [note.get('height', 0) for note in plant_notes]
-                    leaves = [note.get('leaves', 0) for note in plant_notes]
-                    
-                    # Convertir les dates en format lisible
-                    formatted_dates = [format_date(date) for date in dates]
-                    
-                    # Créer un DataFrame
-                    df = pd.DataFrame({
-                        'date': formatted_dates,
-                        'height': heights,
-                        'leaves': leaves
-                    })
-                    
-                    # Créer le graphique avec Plotly
-                    fig = px.bar(
-                        df,
-                        x='date',
-                        y=['height', 'leaves'],
-                        barmode='group',
-                        labels={'date': 'Date', 'value': 'Valeur', 'variable': 'Mesure'},
-                        title="Évolution de la hauteur et du nombre de feuilles"
-                    )
-                    
-                    # Personnaliser les noms des séries
-                    fig.update_layout(
-                        legend=dict(
-                            title="",
-                            orientation="h",
-                            yanchor="bottom",
-                            y=1.02,
-                            xanchor="right",
-                            x=1
-                        )
-                    )
-                    
-                    # Renommer les séries
-                    newnames = {'height': 'Hauteur (cm)', 'leaves': 'Nombre de feuilles'}
-                    fig.for_each_trace(lambda t: t.update(name = newnames[t.name]))
-                    
-                    st.plotly_chart(fig, use_container_width=True)
-                else:
-                    st.info("Pas assez de données pour cette plante.")
-            else:
-                st.subheader("Distribution par Type")
+                if note.image:
+                    display_image(note.image, store.blobs)
                 
-                # Compter les variétés de plantes
-                varieties = {}
-                for plant in plants:
-                    variety = plant.get('variety', 'Non spécifiée')
-                    if variety not in varieties:
-                        varieties[variety] = 0
-                    varieties[variety] += 1
+                # Afficher les métriques
+                note_metrics(note)
                 
-                if varieties:
-                    # Créer un DataFrame pour le graphique
-                    df = pd.DataFrame({
-                        'Variété': list(varieties.keys()),
-                        'Nombre': list(varieties.values())
-                    })
-                    
-                    # Créer le graphique
-                    fig = px.pie(df, values='Nombre', names='Variété', title="Distribution des variétés")
-                    fig.update_traces(textposition='inside', textinfo='percent+label')
-                    
-                    st.plotly_chart(fig, use_container_width=True)
-                else:
-                    st.info("Pas de données de variété disponibles.")
+                st.divider()
 
-# Mettre à jour les données automatiquement (à la fin du script)
+# Section Liste des Plantes
+elif nav_option == "Mes Plantes":
+    st.header("Mes Plantes")
+    plant_grid()
+
+# Section Ajouter une Plante
+elif nav_option == "Ajouter une Plante":
+    st.header("Ajouter une Nouvelle Plante")
+    plant_form()
+    
+    # Hors du formulaire (st.button n'y est pas permis) : retour à la liste en une seule exécution
+    st.button("Voir la liste des plantes", on_click=go_to, args=("Mes Plantes",))
+
+# Section Notes
+elif nav_option == "Notes":
+    st.header("Notes et Observations")
+    
+    # Sélecteur de plante
+    plant_options = [(p.id, f"{p.name} ({p.variety or 'Variété non spécifiée'})") for p in plants]
+    plant_options.insert(0, ("", "Toutes les plantes"))
+    plant_labels = dict(plant_options)
+    
+    # La plante peut avoir été choisie depuis une autre page (bouton « Ajouter une note »)
+    if st.session_state.get('notes_plant_id') not in plant_labels:
+        st.session_state['notes_plant_id'] = ""
+    
+    selected_plant_id = st.selectbox(
+        "Sélectionner une plante",
+        options=[p[0] for p in plant_options],
+        format_func=plant_labels.get,
+        key='notes_plant_id'
+    )
+    
+    observations(selected_plant_id)
+
+# Section Statistiques
+elif nav_option == "Statistiques":
+    st.header("Statistiques et Progrès")
+    
+    if not plants:
+        st.warning("Ajoutez des plantes pour voir les statistiques.")
+    else:
+        growth_charts()
+        parquet_export()
+
+profiler.lap("Sauvegarde")
+
+# Sauvegarder les modifications en attente (à la fin du script)
 try:
-    if 'plants' in st.session_state and 'notes' in st.session_state:
-        save_result = save_data(st.session_state['plants'], st.session_state['notes'])
+    if store.dirty:
+        save_result = save_data(store)
         if not save_result:
             st.sidebar.warning("⚠️ Problème lors de la sauvegarde automatique des données")
 except Exception as e:
     st.sidebar.error("Erreur de sauvegarde")
+
+# Octets écrits sur le disque depuis l'exécution précédente
+st.sidebar.caption(f"💾 {store.bytes_written} octets écrits lors de cette exécution")
+# Le cache des déclinaisons ne sert que sans le service de fichiers statiques
+if not st.get_option('server.enableStaticServing'):
+    st.sidebar.caption(f"🖼️ Cache d'images : {rendition_cache.hits} succès, {rendition_cache.misses} échecs")
+store.bytes_written = 0
+
+# Panneau de profilage : mesures de cette exécution, également ajoutées au journal de profilage
+if profiler.enabled:
+    report = profiler.report()
+    with st.sidebar.expander(f"⏱️ Profilage : {report['total_ms']:.0f} ms", expanded=True):
+        for name, timing in sorted(report['timings'].items(), key=lambda item: -item[1]['ms']):
+            st.caption(f"{name} : {timing['ms']:.1f} ms ({timing['calls']} appel(s))")
+        for name, value in report['counters'].items():
+            st.caption(f"{name} : {value}")
+    try:
+        profiling.write_log(report)
+    except OSError as e:
+        print(f"Erreur d'écriture du journal de profilage: {str(e)}")
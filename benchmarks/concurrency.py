@@ -0,0 +1,83 @@
+"""Vérification des écritures concurrentes de plusieurs processus dans le même journal
+
+Chaque processus (comme le service d'ingestion à côté de l'application) ajoute ses notes une à
+une par GardenStore ; le seuil de fusion du journal est abaissé pour que les fusions se
+produisent pendant les écritures. À la fin, le journal doit contenir toutes les notes.
+
+Utilisation : python benchmarks/concurrency.py [--backend json|sqlite|partitioned] [--processes 2] [--notes 1500]
+"""
+import argparse
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import storage  # noqa: E402
+from records import Note, Plant  # noqa: E402
+from storage import GardenStore, open_backend  # noqa: E402
+
+PLANT_ID = 'plant-0'
+
+
+def writer(data_dir, backend, worker, notes, start):
+    """Exécuté dans chaque processus : ajouter les notes une à une, chacune dans sa propre écriture"""
+    storage.LOG_COMPACT_BYTES = 16 * 1024
+    start.wait()
+    store = GardenStore.open_shared(open_backend(backend, data_dir))
+    for i in range(notes):
+        store = store.refresh()
+        store.add_note(Note(f"w{worker}-{i}", PLANT_ID, 739000 + i % 365, f"Note {i} du processus {worker}"))
+        store.flush()
+    # Laisser la dernière fusion lancée en arrière-plan se terminer
+    while storage._compacting:
+        time.sleep(0.01)
+
+
+def run(backend, processes, notes):
+    """Lancer les processus et renvoyer (notes attendues, notes trouvées, secondes)"""
+    data_dir = tempfile.mkdtemp(prefix='garden-concurrency-')
+    try:
+        store = GardenStore(open_backend(backend, data_dir))
+        store.add_plant(Plant(PLANT_ID, "Tomate", 739000))
+        store.flush()
+
+        context = multiprocessing.get_context('spawn')
+        start = context.Event()
+        workers = [context.Process(target=writer, args=(data_dir, backend, worker, notes, start))
+                   for worker in range(processes)]
+        for process in workers:
+            process.start()
+        began = time.perf_counter()
+        start.set()
+        for process in workers:
+            process.join()
+        elapsed = time.perf_counter() - began
+        if any(process.exitcode for process in workers):
+            raise RuntimeError("un processus d'écriture a échoué")
+
+        found = GardenStore.load(open_backend(backend, data_dir)).count_notes()
+        return processes * notes, found, elapsed
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Écritures concurrentes de plusieurs processus")
+    parser.add_argument('--backend', choices=sorted(storage.BACKENDS), default='json')
+    parser.add_argument('--processes', type=int, default=2)
+    parser.add_argument('--notes', type=int, default=1500, help="Notes ajoutées par processus")
+    args = parser.parse_args(argv)
+
+    expected, found, elapsed = run(args.backend, args.processes, args.notes)
+    print(f"{args.backend} : {found} notes sur {expected} attendues "
+          f"({args.processes} processus, {elapsed:.1f} s)")
+    return 0 if found == expected else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,148 @@
+"""Générateur déterministe de jardins synthétiques pour les mesures de performance
+
+Utilisation : python benchmarks/garden.py DOSSIER [--plants N] [--notes N] [--photos PART] [--seed N]
+"""
+import argparse
+import datetime
+import io
+import os
+import random
+import sys
+import uuid
+from contextlib import closing
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from PIL import Image, ImageDraw  # noqa: E402
+
+from images import BlobStore, PHOTOS_DIR  # noqa: E402
+from records import Note, Plant  # noqa: E402
+from storage import JsonBackend, PartitionedBackend, SqliteBackend, write_json  # noqa: E402
+
+# Tailles prédéfinies : (plantes, notes)
+SIZES = {
+    'small': (10, 1_000),
+    'medium': (1_000, 100_000),
+    'large': (10_000, 1_000_000),
+}
+
+# Nombre de photos distinctes : les enregistrements avec photo se les partagent
+PHOTO_POOL = 32
+
+VARIETIES = ('Cœur de bœuf', 'Cerise', 'Basilic', 'Menthe', 'Fraise', 'Courgette', 'Laitue', 'Radis')
+CONTAINERS = ('carton-12x12', 'pot-petit', 'pot-moyen', 'pot-grand', 'pleine-terre')
+LOCATIONS = ('Balcon', 'Serre', 'Potager', 'Fenêtre', 'Terrasse')
+OBSERVATIONS = ('Feuilles vertes', 'Premières fleurs', 'Arrosage', 'Taille', 'Feuilles jaunies',
+                'Nouvelle pousse', 'Rempotage', 'Pucerons', 'Récolte')
+
+
+def make_photo(rng, size=(640, 480)):
+    """Photo JPEG déterministe (fond et disques de couleurs tirées au hasard)"""
+    img = Image.new('RGB', size, tuple(rng.randrange(256) for _ in range(3)))
+    draw = ImageDraw.Draw(img)
+    for _ in range(12):
+        x, y = rng.randrange(size[0]), rng.randrange(size[1])
+        radius = rng.randrange(10, max(11, size[0] // 4))
+        draw.ellipse((x - radius, y - radius, x + radius, y + radius),
+                     fill=tuple(rng.randrange(256) for _ in range(3)))
+    buffer = io.BytesIO()
+    img.save(buffer, format='JPEG', quality=90)
+    return buffer.getvalue()
+
+
+def _uuid(rng):
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def generate_records(plants=10, notes=1_000, photo_share=0.1, seed=0, photos=()):
+    """Plantes et notes synthétiques ; une part photo_share des enregistrements référence une photo"""
+    rng = random.Random(seed)
+    start = datetime.date(2020, 1, 1)
+
+    def image():
+        return rng.choice(photos) if photos and rng.random() < photo_share else None
+
+    plant_records = []
+    for i in range(plants):
+        plant_records.append({
+            'id': _uuid(rng),
+            'name': f"{rng.choice(VARIETIES).split()[0]} {i + 1}",
+            'variety': rng.choice(VARIETIES),
+            'container': rng.choice(CONTAINERS),
+            'soil': rng.choice(('Terreau universel', 'Terreau potager', 'Terre de jardin')),
+            'date': (start + datetime.timedelta(days=rng.randrange(365))).isoformat(),
+            'location': rng.choice(LOCATIONS),
+            'notes': f"Plante générée n°{i + 1}",
+            'image': image(),
+        })
+
+    note_records = []
+    for n in range(notes if plants else 0):
+        # Les notes sont réparties uniformément, en une série quotidienne par plante
+        plant = plant_records[n % plants]
+        day = n // plants
+        measured = rng.random() < 0.5
+        note_records.append({
+            'id': _uuid(rng),
+            'plantId': plant['id'],
+            'date': (datetime.date.fromisoformat(plant['date']) + datetime.timedelta(days=day)).isoformat(),
+            'content': f"{rng.choice(OBSERVATIONS)} jour {day}",
+            'height': round(day * 0.3 + rng.random() * 5, 1) if measured else None,
+            'leaves': day // 3 + rng.randrange(4) if measured else None,
+            'image': image(),
+        })
+    return plant_records, note_records
+
+
+def generate_garden(data_dir, plants=10, notes=1_000, photo_share=0.1, seed=0, backend='json'):
+    """Écrire un jardin synthétique dans data_dir, au format du moteur de stockage choisi"""
+    os.makedirs(data_dir, exist_ok=True)
+    rng = random.Random(seed)
+    blobs = BlobStore(os.path.join(data_dir, PHOTOS_DIR))
+    photos = [blobs.put(make_photo(rng)) for _ in range(PHOTO_POOL)] if photo_share else []
+    plant_records, note_records = generate_records(plants, notes, photo_share, seed, photos)
+
+    if backend == 'sqlite':
+        plant_records = [Plant.from_dict(plant) for plant in plant_records]
+        note_records = [Note.from_dict(note) for note in note_records]
+        target = SqliteBackend(data_dir)
+        with closing(target.connect()) as conn:
+            with conn:
+                conn.execute("DELETE FROM notes")
+                conn.execute("DELETE FROM plants")
+                target.insert_plants(conn, plant_records)
+                target.insert_notes(conn, note_records)
+    elif backend == 'partitioned':
+        PartitionedBackend(data_dir).replace_all([Plant.from_dict(plant) for plant in plant_records],
+                                                 [Note.from_dict(note) for note in note_records])
+    else:
+        target = JsonBackend(data_dir)
+        write_json(target.plants_path, plant_records)
+        write_json(target.notes_path, note_records)
+        if os.path.exists(target.log_path):
+            os.remove(target.log_path)
+    return len(plant_records), len(note_records)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Générer un jardin synthétique")
+    parser.add_argument('data_dir', help="Dossier de destination")
+    parser.add_argument('--size', choices=SIZES, default='small', help="Taille prédéfinie")
+    parser.add_argument('--plants', type=int, help="Nombre de plantes (remplace --size)")
+    parser.add_argument('--notes', type=int, help="Nombre de notes (remplace --size)")
+    parser.add_argument('--photos', type=float, default=0.1, help="Part des enregistrements avec photo")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--backend', choices=('json', 'sqlite', 'partitioned'), default='json')
+    args = parser.parse_args(argv)
+
+    plants, notes = SIZES[args.size]
+    plants_count, notes_count = generate_garden(
+        args.data_dir, args.plants or plants, args.notes if args.notes is not None else notes,
+        args.photos, args.seed, args.backend)
+    print(f"{plants_count} plantes et {notes_count} notes générées dans {args.data_dir}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,99 @@
+"""Mesure du démarrage de l'application
+
+Chaque essai lance un nouveau processus Python qui exécute app.py avec l'AppTest de Streamlit :
+- « processus neuf » : du lancement du processus jusqu'au premier rendu (imports compris) ;
+- « session froide » : premier rendu d'une nouvelle session dans ce processus déjà chaud.
+
+Utilisation : python benchmarks/startup.py [--data DOSSIER] [--runs N] [--page PAGE] [--json]
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = os.path.join(ROOT, 'app.py')
+
+
+def child(page):
+    """Exécuté dans le processus mesuré : renvoie les temps sur la sortie standard"""
+    sys.path.insert(0, ROOT)
+    from streamlit.testing.v1 import AppTest
+    # Modules déjà chargés par le banc d'essai lui-même (AppTest importe plotly, par exemple)
+    harness_modules = set(sys.modules)
+
+    def render():
+        at = AppTest.from_file(APP, default_timeout=120)
+        if page:
+            at.session_state['nav_option'] = page
+        at.run()
+        if at.exception:
+            raise RuntimeError(at.exception[0].value)
+        return at
+
+    render()
+    first_render = time.time()
+    start = time.perf_counter()
+    render()
+    cold_session = time.perf_counter() - start
+    heavy = [name for name in ('pandas', 'plotly', 'matplotlib')
+             if name in sys.modules and name not in harness_modules]
+    print(json.dumps({'first_render': first_render, 'cold_session': cold_session, 'heavy_modules': heavy}))
+
+
+def run_once(data_dir, page):
+    """Lancer un processus neuf dans une copie des données et relever ses temps"""
+    with tempfile.TemporaryDirectory() as workdir:
+        if data_dir:
+            shutil.copytree(data_dir, workdir, dirs_exist_ok=True)
+        command = [sys.executable, os.path.abspath(__file__), '--child']
+        if page:
+            command += ['--page', page]
+        # Déclinaisons publiées dans le dossier de travail, pas dans le dossier statique du dépôt
+        env = dict(os.environ, GARDEN_RENDITIONS_DIR=os.path.join(workdir, 'renditions'))
+        start = time.time()
+        output = subprocess.run(command, cwd=workdir, env=env, capture_output=True, text=True,
+                                check=True).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    result['fresh_process'] = result.pop('first_render') - start
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mesurer le temps de démarrage de l'application")
+    parser.add_argument('--data', help="Dossier de données copié pour chaque essai (vide par défaut)")
+    parser.add_argument('--runs', type=int, default=5, help="Nombre d'essais")
+    parser.add_argument('--page', help="Page affichée au premier rendu (tableau de bord par défaut)")
+    parser.add_argument('--json', action='store_true', help="Sortie JSON")
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        child(args.page)
+        return 0
+
+    runs = [run_once(args.data, args.page) for _ in range(args.runs)]
+    report = {
+        'runs': args.runs,
+        'page': args.page or "Tableau de bord",
+        'fresh_process_s': statistics.median(r['fresh_process'] for r in runs),
+        'cold_session_s': statistics.median(r['cold_session'] for r in runs),
+        'heavy_modules': runs[-1]['heavy_modules'],
+    }
+    if args.json:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+    else:
+        print(f"Page : {report['page']} ({args.runs} essais, médianes)")
+        print(f"Processus neuf -> premier rendu : {report['fresh_process_s'] * 1000:.0f} ms")
+        print(f"Session froide -> premier rendu : {report['cold_session_s'] * 1000:.0f} ms")
+        print(f"Modules lourds chargés par l'application : {', '.join(report['heavy_modules']) or 'aucun'}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,202 @@
+"""Banc de mesure des performances sur un jardin synthétique
+
+Mesures (en millisecondes, médiane / min / max de plusieurs essais) :
+- load_data : chargement à froid (GardenStore.load) et ouverture de l'instantané partagé ;
+- save_data : ajout d'une note puis écriture (GardenStore.flush) ;
+- handle_image_upload : traitement d'une photo envoyée par le pool (encodage + stock) ;
+- display_image : déclinaison d'une photo, à froid puis depuis le cache ;
+- pages : rendu de chaque section avec l'AppTest de Streamlit (nouvelle session, puis réexécution).
+
+Utilisation : python benchmarks/suite.py [--size small|medium|large] [--output FICHIER] [--compare ANCIEN]
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import images  # noqa: E402
+import storage  # noqa: E402
+from garden import SIZES, generate_garden, make_photo  # noqa: E402
+from images import BlobStore, PHOTOS_DIR, get_rendition, make_rendition, publish_rendition, submit_photo  # noqa: E402
+from records import Note  # noqa: E402
+from storage import GardenStore, open_backend  # noqa: E402
+
+APP = os.path.join(ROOT, 'app.py')
+PAGES = ("Tableau de bord", "Mes Plantes", "Notes", "Statistiques")
+
+
+def measure(function, runs, setup=None):
+    """Durées d'exécution de function (setup, s'il est fourni, n'est pas chronométré)"""
+    timings = []
+    for _ in range(runs):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - start) * 1000)
+    return {
+        'median_ms': round(statistics.median(timings), 3),
+        'min_ms': round(min(timings), 3),
+        'max_ms': round(max(timings), 3),
+        'runs': runs,
+    }
+
+
+def bench_persistence(backend, runs):
+    results = {}
+    # Chargement à froid : l'instantané partagé du processus est oublié avant chaque essai
+    results['load_data.cold'] = measure(lambda: GardenStore.open_shared(backend), runs,
+                                        setup=storage._shared_stores.clear)
+    results['load_data.shared'] = measure(lambda: GardenStore.open_shared(backend), runs)
+
+    store = GardenStore.open_shared(backend)
+    plant_ids = [plant.id for plant in store.plants]
+    counter = iter(range(10 ** 9))
+
+    def add_note():
+        n = next(counter)
+        store.add_note(Note(f"bench-{n}", plant_ids[n % len(plant_ids)], datetime.date.today().toordinal(),
+                            f"Mesure {n}", height=10.0, leaves=4))
+
+    results['save_data'] = measure(store.flush, runs, setup=add_note)
+    return results
+
+
+def bench_images(blobs, runs):
+    results = {}
+    rng = random.Random(1)
+    # Photos « de téléphone » distinctes, pour que chaque essai encode et stocke une nouvelle image
+    uploads = [make_photo(rng, size=(4032, 3024)) for _ in range(runs)]
+    pending = iter(uploads)
+    results['handle_image_upload'] = measure(
+        lambda: submit_photo(next(pending), blobs, lambda digest: None).result(), runs)
+
+    digest = blobs.put(uploads[0])
+    results['display_image.cold'] = measure(lambda: make_rendition(blobs.get(digest), 'full'), runs)
+    get_rendition(digest, blobs, 'full')
+    results['display_image.cached'] = measure(lambda: get_rendition(digest, blobs, 'full'), runs)
+    publish_rendition(digest, blobs, 'full')
+    results['display_image.published'] = measure(lambda: publish_rendition(digest, blobs, 'full'), runs)
+    return results
+
+
+def bench_pages(runs):
+    from streamlit.testing.v1 import AppTest
+
+    results = {}
+    for page in PAGES:
+        def new_session():
+            at = AppTest.from_file(APP, default_timeout=600)
+            at.session_state['nav_option'] = page
+            at.run()
+            if at.exception:
+                raise RuntimeError(f"{page} : {at.exception[0].value}")
+            return at
+
+        results[f"page.{page}.new_session"] = measure(new_session, runs)
+        at = new_session()
+        results[f"page.{page}.rerun"] = measure(at.run, runs)
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, previous_path):
+    """Afficher l'écart des médianes avec un fichier de résultats précédent"""
+    with open(previous_path, 'r', encoding='utf-8') as f:
+        previous = json.load(f)['results']
+    for name, result in results.items():
+        if name in previous:
+            before, after = previous[name]['median_ms'], result['median_ms']
+            change = (after - before) / before * 100 if before else 0.0
+            print(f"{name:40} {before:10.1f} -> {after:10.1f} ms ({change:+.0f} %)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mesurer les performances sur un jardin synthétique")
+    parser.add_argument('--size', choices=SIZES, default='small', help="Taille prédéfinie du jardin")
+    parser.add_argument('--plants', type=int, help="Nombre de plantes (remplace --size)")
+    parser.add_argument('--notes', type=int, help="Nombre de notes (remplace --size)")
+    parser.add_argument('--photos', type=float, default=0.1, help="Part des enregistrements avec photo")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--backend', choices=('json', 'sqlite', 'partitioned'), default='json')
+    parser.add_argument('--runs', type=int, default=5, help="Nombre d'essais par mesure")
+    parser.add_argument('--skip-pages', action='store_true', help="Ne pas mesurer le rendu des pages")
+    parser.add_argument('--output', default='bench_results.json', help="Fichier JSON des résultats")
+    parser.add_argument('--compare', help="Fichier JSON d'une mesure précédente à comparer")
+    args = parser.parse_args(argv)
+
+    plants, notes = SIZES[args.size]
+    plants = args.plants or plants
+    notes = args.notes if args.notes is not None else notes
+    output = os.path.abspath(args.output)
+
+    workdir = tempfile.mkdtemp(prefix='garden-bench-')
+    cwd = os.getcwd()
+    try:
+        start = time.perf_counter()
+        generate_garden(workdir, plants, notes, args.photos, args.seed, args.backend)
+        print(f"Jardin généré : {plants} plantes, {notes} notes ({time.perf_counter() - start:.1f} s)")
+
+        # L'application lit ses données dans le dossier courant, avec le moteur de GARDEN_BACKEND
+        os.chdir(workdir)
+        os.environ['GARDEN_BACKEND'] = args.backend
+        # Déclinaisons publiées dans le dossier de travail, pas dans le dossier statique du dépôt
+        images.RENDITIONS_DIR = os.environ['GARDEN_RENDITIONS_DIR'] = os.path.join(workdir, 'renditions')
+        backend = open_backend(args.backend, workdir)
+
+        results = {}
+        results.update(bench_persistence(backend, args.runs))
+        results.update(bench_images(BlobStore(os.path.join(workdir, PHOTOS_DIR)), args.runs))
+        if not args.skip_pages:
+            results.update(bench_pages(args.runs))
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'meta': {
+            'revision': git_revision(),
+            'date': datetime.datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'backend': args.backend,
+            'plants': plants,
+            'notes': notes,
+            'photo_share': args.photos,
+            'seed': args.seed,
+        },
+        'results': results,
+    }
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+    for name, result in results.items():
+        print(f"{name:40} {result['median_ms']:10.1f} ms")
+    if args.compare:
+        print(f"\nComparaison avec {args.compare} :")
+        compare(results, args.compare)
+    print(f"\nRésultats enregistrés dans {output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,54 @@
+"""Jardins multiples : un dossier de données par jardin (parcelle, jardinier)
+
+Le jardin principal est le dossier des données lui-même (GARDEN_DATA_DIR, le dossier courant
+par défaut) : une installation existante le retrouve sans rien déplacer. Les autres jardins sont
+ses sous-dossiers gardens/<nom>/, avec chacun son journal et ses photos.
+"""
+import os
+import re
+import unicodedata
+
+DATA_DIR = os.environ.get('GARDEN_DATA_DIR', '.')
+GARDENS_DIR = 'gardens'
+
+# Nom du jardin principal
+DEFAULT_GARDEN = ''
+
+# Noms de jardin : minuscules, chiffres et tirets (jamais de chemin)
+_NAME = re.compile(r'^[a-z0-9][a-z0-9_-]{0,63}$')
+
+
+def garden_name(label):
+    """Nom de dossier d'un jardin à partir du libellé saisi (« Parcelle 12 » -> parcelle-12)"""
+    text = unicodedata.normalize('NFKD', label).encode('ascii', 'ignore').decode('ascii')
+    name = re.sub(r'[^a-z0-9_]+', '-', text.lower()).strip('-_')[:64]
+    if not _NAME.match(name):
+        raise ValueError(f"Nom de jardin invalide : {label!r}")
+    return name
+
+
+def garden_dir(name=DEFAULT_GARDEN, root=None):
+    """Dossier des données d'un jardin"""
+    root = root or DATA_DIR
+    if name == DEFAULT_GARDEN:
+        return root
+    if not _NAME.match(name or ''):
+        raise ValueError(f"Nom de jardin invalide : {name!r}")
+    return os.path.join(root, GARDENS_DIR, name)
+
+
+def list_gardens(root=None):
+    """Jardins existants, le jardin principal en premier"""
+    path = os.path.join(root or DATA_DIR, GARDENS_DIR)
+    try:
+        names = sorted(entry.name for entry in os.scandir(path) if entry.is_dir() and _NAME.match(entry.name))
+    except FileNotFoundError:
+        names = []
+    return [DEFAULT_GARDEN] + names
+
+
+def create_garden(label, root=None):
+    """Créer le dossier d'un nouveau jardin (sans effet s'il existe déjà) et renvoyer son nom"""
+    name = garden_name(label)
+    os.makedirs(garden_dir(name, root), exist_ok=True)
+    return name
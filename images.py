@@ -0,0 +1,309 @@
+import base64
+import hashlib
+import io
+import os
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image, ImageOps, features
+
+import profiling
+
+PHOTOS_DIR = 'garden_photos'
+
+# Déclinaisons publiées comme fichiers statiques (servis par Streamlit sous app/static/) ;
+# GARDEN_RENDITIONS_DIR les écrit ailleurs (bancs d'essai, tests), où elles ne sont pas servies
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+RENDITIONS_DIR = os.environ.get('GARDEN_RENDITIONS_DIR') or os.path.join(STATIC_DIR, 'renditions')
+
+# Tailles maximales des déclinaisons affichées
+RENDITION_SIZES = {
+    'thumb': (320, 320),  # cartes des grilles de plantes
+    'full': (800, 800),   # vues détaillées (journal, notes)
+}
+
+# Taille cible (octets) de chaque déclinaison : la qualité est cherchée pour ne pas la dépasser
+RENDITION_BUDGETS = {
+    'thumb': 20 * 1024,
+    'full': 80 * 1024,
+}
+
+# Taille cible de la photo conservée dans le stock (JPEG progressif, 800 px au plus)
+PHOTO_BUDGET = 200 * 1024
+
+# Bornes de la recherche de qualité
+MIN_QUALITY = 40
+MAX_QUALITY = 90
+
+# Format des déclinaisons (GARDEN_IMAGE_FORMAT=webp|jpeg) ; JPEG progressif si Pillow n'a pas WebP
+IMAGE_FORMAT = os.environ.get('GARDEN_IMAGE_FORMAT', 'webp').lower()
+if IMAGE_FORMAT not in ('webp', 'jpeg') or (IMAGE_FORMAT == 'webp' and not features.check('webp')):
+    IMAGE_FORMAT = 'jpeg'
+
+_EXTENSIONS = {'webp': 'webp', 'jpeg': 'jpg'}
+
+# Mémoire maximale occupée par le cache des déclinaisons
+RENDITION_CACHE_BYTES = 64 * 1024 * 1024
+
+# Pool de traitement des photos envoyées : PIL libère le GIL pendant le décodage et l'encodage
+_upload_pool = ThreadPoolExecutor(max_workers=min(4, os.cpu_count() or 1), thread_name_prefix='photos')
+
+# Une référence de photo est l'empreinte SHA-256 (hexadécimale) de son contenu
+_DIGEST_RE = re.compile(r'^[0-9a-f]{64}$')
+
+
+def is_blob_ref(value):
+    """Indique si une valeur est une référence vers le stock de photos"""
+    return isinstance(value, str) and bool(_DIGEST_RE.match(value))
+
+
+def _encode(img, fmt, quality):
+    buffer = io.BytesIO()
+    if fmt == 'webp':
+        img.save(buffer, format='WEBP', quality=quality, method=4)
+    else:
+        # JPEG progressif : l'image s'affiche grossièrement dès les premiers octets reçus
+        img.save(buffer, format='JPEG', quality=quality, optimize=True, progressive=True)
+    return buffer.getvalue()
+
+
+def encode_within_budget(img, fmt, budget):
+    """Encoder une image à la meilleure qualité qui tient dans budget octets (recherche dichotomique)
+
+    Si même la qualité minimale dépasse le budget, c'est elle qui est gardée.
+    """
+    best = None
+    low, high = MIN_QUALITY, MAX_QUALITY
+    while low <= high:
+        quality = (low + high) // 2
+        data = _encode(img, fmt, quality)
+        profiling.count('images_encoded')
+        if len(data) <= budget:
+            best = data
+            low = quality + 1
+        else:
+            high = quality - 1
+    return best if best is not None else _encode(img, fmt, MIN_QUALITY)
+
+
+def encode_photo(uploaded_file):
+    """Redimensionner une image et l'encoder en JPEG progressif, dans le budget du stock"""
+    # Ouvrir l'image avec PIL
+    img = Image.open(uploaded_file)
+    max_size = (800, 800)  # Taille maximale
+
+    # JPEG déjà à la bonne taille, dans le budget et sans rotation EXIF (photos des anciennes versions) : gardé tel quel
+    if (img.format == 'JPEG' and img.width <= max_size[0] and img.height <= max_size[1]
+            and img.getexif().get(0x0112, 1) == 1):
+        uploaded_file.seek(0)
+        data = uploaded_file.read()
+        if len(data) <= PHOTO_BUDGET:
+            return data
+
+    # Pour un JPEG, décoder directement à échelle réduite (1/2, 1/4 ou 1/8) plutôt qu'en pleine résolution
+    img.draft('RGB', max_size)
+
+    # Appliquer l'orientation EXIF des photos de téléphone
+    img = ImageOps.exif_transpose(img)
+
+    # Redimensionner l'image pour réduire sa taille
+    img.thumbnail(max_size, Image.LANCZOS)
+
+    # Convertir en RGB si nécessaire (pour les images PNG avec transparence)
+    if img.mode in ('RGBA', 'LA'):
+        background = Image.new(img.mode[:-1], img.size, (255, 255, 255))
+        background.paste(img, img.split()[-1])
+        img = background
+    elif img.mode not in ('RGB', 'L'):
+        img = img.convert('RGB')
+
+    # Meilleure qualité qui tient dans le budget
+    return encode_within_budget(img, 'jpeg', PHOTO_BUDGET)
+
+
+def _process_photo(data, blobs, on_ready):
+    digest = blobs.put(encode_photo(io.BytesIO(data)))
+    # Déclinaisons publiées dès maintenant : le premier affichage n'a plus à les encoder
+    for rendition in RENDITION_SIZES:
+        publish_rendition(digest, blobs, rendition)
+    on_ready(digest)
+    return digest
+
+
+def submit_photo(data, blobs, on_ready):
+    """Confier une photo au pool de traitement ; on_ready(référence) est appelé une fois la photo stockée"""
+    return _upload_pool.submit(_process_photo, data, blobs, on_ready)
+
+
+class BlobStore:
+    """Photos écrites une seule fois sur disque, nommées par l'empreinte de leur contenu"""
+
+    def __init__(self, root=PHOTOS_DIR):
+        self.root = root
+
+    def path(self, digest):
+        """Chemin du fichier d'une photo (répartie en sous-dossiers par préfixe)"""
+        return os.path.join(self.root, digest[:2], f"{digest}.jpg")
+
+    def put(self, data):
+        """Enregistrer une photo et renvoyer sa référence ; un contenu identique n'est stocké qu'une fois"""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        return digest
+
+    def get(self, digest):
+        """Lire le contenu d'une photo"""
+        with open(self.path(digest), 'rb') as f:
+            data = f.read()
+        profiling.count('bytes_read', len(data))
+        return data
+
+    def delete(self, digest):
+        """Supprimer une photo du stock, ainsi que ses déclinaisons publiées"""
+        try:
+            os.remove(self.path(digest))
+        except FileNotFoundError:
+            pass
+        unpublish(digest)
+
+    def externalize(self, image):
+        """Déplacer une image base64 intégrée (ancien format) vers le stock et renvoyer sa référence"""
+        if isinstance(image, str) and image.startswith('data:'):
+            return self.put(base64.b64decode(image.split(',', 1)[1]))
+        return image
+
+
+def make_rendition(data, rendition, fmt=None):
+    """Produire la déclinaison d'une photo à la taille et dans le budget demandés (format IMAGE_FORMAT)"""
+    fmt = fmt or IMAGE_FORMAT
+    img = Image.open(io.BytesIO(data))
+    max_size = RENDITION_SIZES[rendition]
+    budget = RENDITION_BUDGETS[rendition]
+
+    # Photo déjà assez petite et légère dans le bon format : les octets d'origine sont réutilisés
+    if (img.format == fmt.upper() and img.width <= max_size[0] and img.height <= max_size[1]
+            and len(data) <= budget):
+        return data
+
+    profiling.count('images_decoded')
+    img.draft('RGB', max_size)
+    img.thumbnail(max_size, Image.LANCZOS)
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    return encode_within_budget(img, fmt, budget)
+
+
+class RenditionCache:
+    """Cache LRU borné des déclinaisons de photos, partagé par toutes les sessions"""
+
+    def __init__(self, max_bytes=RENDITION_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, rendition, load):
+        """Renvoyer la déclinaison d'une image, en ne la décodant qu'en cas d'absence du cache"""
+        cache_key = (key, rendition)
+        with self._lock:
+            data = self._entries.get(cache_key)
+            if data is not None:
+                self._entries.move_to_end(cache_key)
+                self.hits += 1
+                return data
+            self.misses += 1
+
+        # Le décodage se fait hors du verrou pour ne pas bloquer les autres sessions
+        data = make_rendition(load(), rendition)
+
+        with self._lock:
+            if cache_key not in self._entries:
+                self._entries[cache_key] = data
+                self._size += len(data)
+                while self._size > self.max_bytes and len(self._entries) > 1:
+                    _, evicted = self._entries.popitem(last=False)
+                    self._size -= len(evicted)
+        return data
+
+    def __len__(self):
+        return len(self._entries)
+
+
+rendition_cache = RenditionCache()
+
+
+def _image_key(image):
+    """Identité d'une photo : sa référence, ou l'empreinte de la chaîne base64 (ancien format)"""
+    return image if is_blob_ref(image) else hashlib.sha256(image.encode('ascii')).hexdigest()
+
+
+def _load(image, blobs):
+    if is_blob_ref(image):
+        return lambda: blobs.get(image)
+    return lambda: base64.b64decode(image.split(',', 1)[1])
+
+
+def get_rendition(image, blobs, rendition='full'):
+    """Octets d'une photo (référence du stock ou ancienne image base64) à la taille demandée"""
+    return rendition_cache.get(_image_key(image), rendition, _load(image, blobs))
+
+
+def _rendition_name(key, rendition):
+    # Les réglages font partie du nom : les changer publie de nouveaux fichiers au lieu de servir les anciens
+    width = RENDITION_SIZES[rendition][0]
+    budget = RENDITION_BUDGETS[rendition] // 1024
+    return f"{key}.{rendition}-{width}-{budget}k.{_EXTENSIONS[IMAGE_FORMAT]}"
+
+
+# Déclinaisons déjà publiées par ce processus (évite de retester le disque à chaque affichage)
+_published = set()
+
+
+def publish_rendition(image, blobs, rendition='full'):
+    """URL stable d'une déclinaison publiée dans le dossier statique, écrite à la première demande
+
+    Le nom du fichier contient l'empreinte de la photo : son contenu ne change jamais, le paramètre
+    ?v= demande donc au serveur une durée de cache maximale (10 ans) et le navigateur ne la
+    retélécharge plus.
+    """
+    key = _image_key(image)
+    name = _rendition_name(key, rendition)
+    relative = f"{key[:2]}/{name}"
+    path = os.path.join(RENDITIONS_DIR, key[:2], name)
+    if path not in _published:
+        if not os.path.exists(path):
+            data = make_rendition(_load(image, blobs)(), rendition)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            profiling.count('bytes_written', len(data))
+        _published.add(path)
+    return f"app/static/renditions/{relative}?v={key[:12]}"
+
+
+def unpublish(key):
+    """Supprimer les déclinaisons publiées d'une photo"""
+    shard = os.path.join(RENDITIONS_DIR, key[:2])
+    try:
+        names = [name for name in os.listdir(shard) if name.startswith(key + '.')]
+    except FileNotFoundError:
+        return
+    for name in names:
+        path = os.path.join(shard, name)
+        _published.discard(path)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,171 @@
+"""Import en masse de mesures (CSV ou JSON-lines) dans le journal, en une seule écriture
+
+Colonnes attendues : plantId, date (AAAA-MM-JJ), et au moins une de height, leaves, content.
+
+Utilisation : python importer.py fichier.csv|fichier.jsonl [dossier_des_données]
+"""
+import argparse
+import os
+import sys
+import time
+import uuid
+
+import pandas as pd
+
+from records import Note, parse_day
+
+# Lignes lues et validées à la fois : le fichier n'est jamais chargé en entier
+CHUNK_ROWS = 50_000
+
+IMPORT_COLUMNS = ('plantId', 'date', 'height', 'leaves', 'content')
+
+
+class ImportReport:
+    """Bilan d'un import : lignes lues, importées, rejetées (par motif) et doublons"""
+
+    def __init__(self):
+        self.rows = 0
+        self.imported = 0
+        self.duplicates = 0
+        self.rejected = {}
+        self.seconds = 0.0
+
+    def reject(self, reason, count):
+        if count:
+            self.rejected[reason] = self.rejected.get(reason, 0) + int(count)
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def summary(self):
+        rejected = sum(self.rejected.values())
+        speed = f"{self.rows_per_second:,.0f}".replace(',', ' ')
+        text = (f"{self.imported} mesures importées sur {self.rows} lignes "
+                f"({self.duplicates} doublons, {rejected} rejetées) en {self.seconds:.2f} s, "
+                f"soit {speed} lignes/s")
+        if self.rejected:
+            text += " — rejets : " + ", ".join(f"{reason} ({count})" for reason, count in self.rejected.items())
+        return text
+
+
+def read_chunks(source, fmt=None):
+    """Lire un fichier CSV ou JSON-lines par blocs de CHUNK_ROWS lignes"""
+    if fmt is None:
+        name = source if isinstance(source, str) else getattr(source, 'name', '')
+        fmt = 'jsonl' if name.lower().endswith(('.jsonl', '.json', '.ndjson')) else 'csv'
+    if fmt == 'jsonl':
+        return pd.read_json(source, lines=True, chunksize=CHUNK_ROWS, dtype=False)
+    return pd.read_csv(source, chunksize=CHUNK_ROWS, dtype={'plantId': str, 'date': str, 'content': str})
+
+
+def validate(chunk, plant_ids, report):
+    """Normaliser un bloc et écarter les lignes invalides (opérations vectorisées sur les colonnes)"""
+    report.rows += len(chunk)
+    frame = pd.DataFrame(index=chunk.index)
+    for column in IMPORT_COLUMNS:
+        frame[column] = chunk[column] if column in chunk else None
+
+    frame['date'] = pd.to_datetime(frame['date'], errors='coerce', format='ISO8601')
+    # Comme dans le formulaire des notes, une mesure nulle est une mesure absente
+    frame['height'] = pd.to_numeric(frame['height'], errors='coerce').replace(0, float('nan'))
+    frame['leaves'] = pd.to_numeric(frame['leaves'], errors='coerce').replace(0, float('nan'))
+    frame['content'] = frame['content'].fillna('').astype(str).str.strip()
+
+    checks = (
+        ("plante inconnue", ~frame['plantId'].isin(plant_ids)),
+        ("date invalide", frame['date'].isna()),
+        ("mesure invalide", (frame['height'] < 0) | (frame['leaves'] < 0) | (frame['leaves'] % 1 > 0)),
+        ("ligne vide", frame['height'].isna() & frame['leaves'].isna() & (frame['content'] == '')),
+    )
+    valid = pd.Series(True, index=frame.index)
+    for reason, invalid in checks:
+        invalid &= valid
+        report.reject(reason, invalid.sum())
+        valid &= ~invalid
+    frame = frame[valid]
+    frame['date'] = frame['date'].dt.strftime('%Y-%m-%d')
+    return frame
+
+
+def existing_days(store, frame):
+    """Couples (plante, jour) du lot pour lesquels le journal a déjà une note, mesurée ou non
+
+    Une seule requête par plante, limitée à la période couverte par le lot.
+    """
+    existing = set()
+    days = frame['date'].map(parse_day)
+    for plant_id, plant_days in days.groupby(frame['plantId']):
+        notes = store.recent_notes(plant_id=plant_id, start=int(plant_days.min()), end=int(plant_days.max()))
+        existing.update((plant_id, note.day) for note in notes)
+    return existing
+
+
+def add_batch(store, frame, report, dedupe=True):
+    """Ajouter au journal les lignes validées d'un lot ; ne sauvegarde pas
+
+    Avec dedupe, une seule note est gardée par plante et par jour (la dernière du lot, et seulement
+    si le journal n'en a pas déjà une) ; sans, toutes les lignes deviennent des notes.
+    """
+    if dedupe:
+        duplicated = frame.duplicated(['plantId', 'date'], keep='last')
+        days = existing_days(store, frame)
+        existing = pd.Series([(plant_id, parse_day(date)) in days
+                              for plant_id, date in zip(frame['plantId'], frame['date'])],
+                             index=frame.index, dtype=bool)
+        report.duplicates += int((duplicated | existing).sum())
+        frame = frame[~(duplicated | existing)]
+
+    heights = frame['height'].astype(object).where(frame['height'].notna(), None)
+    leaves = frame['leaves'].astype(object).where(frame['leaves'].notna(), None)
+    for plant_id, date, height, leaf_count, content in zip(
+            frame['plantId'], frame['date'], heights, leaves, frame['content']):
+        store.add_note(Note(
+            id=str(uuid.uuid4()),
+            plant_id=plant_id,
+            day=parse_day(date),
+            content=content,
+            height=float(height) if height is not None else None,
+            leaves=int(leaf_count) if leaf_count is not None else None,
+        ))
+    report.imported += len(frame)
+
+
+def import_measurements(store, source, fmt=None):
+    """Importer un fichier de mesures dans le journal et l'enregistrer en une seule écriture
+
+    Une seule mesure est gardée par plante et par jour : la dernière du fichier, et seulement si
+    le journal n'en contient pas déjà une pour ce jour.
+    """
+    report = ImportReport()
+    start = time.perf_counter()
+    plant_ids = list(store.index.plants_by_id)
+
+    batch = [validate(chunk, plant_ids, report) for chunk in read_chunks(source, fmt)]
+    if batch:
+        add_batch(store, pd.concat(batch), report)
+
+    # Toutes les mesures sont enregistrées ensemble
+    store.flush()
+    report.seconds = time.perf_counter() - start
+    return report
+
+
+def main(argv=None):
+    from storage import GardenStore, open_backend
+
+    parser = argparse.ArgumentParser(description="Importer des mesures depuis un fichier CSV ou JSON-lines")
+    parser.add_argument('path', help="Fichier CSV ou JSON-lines")
+    parser.add_argument('data_dir', nargs='?', default='.', help="Dossier des données du jardin")
+    parser.add_argument('--format', choices=('csv', 'jsonl'), help="Format du fichier (deviné par défaut)")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.path):
+        parser.error(f"Fichier introuvable : {args.path}")
+    store = GardenStore.load(open_backend(data_dir=args.data_dir))
+    print(import_measurements(store, args.path, args.format).summary())
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,206 @@
+from bisect import bisect_left, insort
+from collections import Counter
+
+from search import NOTE_FIELDS, PLANT_FIELDS, SearchIndex
+
+
+def _plant_key(plant):
+    return (plant.day, plant.id)
+
+
+def _note_key(note):
+    return (note.day, note.id)
+
+
+def _remove_sorted(records, record, key):
+    """Retirer un enregistrement d'une liste triée (recherche dichotomique)"""
+    i = bisect_left(records, key(record), key=key)
+    if i < len(records) and records[i].id == record.id:
+        del records[i]
+
+
+def _day_bounds(records, start=None, end=None):
+    """Positions des enregistrements datés de start à end (numéros de jour inclus, None = sans borne)"""
+    lo = bisect_left(records, (start,), key=_note_key) if start is not None else 0
+    hi = bisect_left(records, (end + 1,), key=_note_key) if end is not None else len(records)
+    # Période vide (start après end) : aucune note, comme pour les autres moteurs
+    return lo, max(lo, hi)
+
+
+def _newest_first(records, limit=None, offset=0, lo=0, hi=None):
+    """Parcourir une liste triée par date croissante en partant de la fin (entre les positions lo et hi)"""
+    end = (len(records) if hi is None else hi) - offset
+    start = max(lo, end - limit) if limit else lo
+    return records[start:max(lo, end)][::-1]
+
+
+class GardenIndex:
+    """Index en mémoire des plantes et des notes, tenus à jour à chaque modification"""
+
+    def __init__(self, plants, notes=None):
+        self.plants_by_id = {plant.id: plant for plant in plants}
+        self.plants_by_date = sorted(plants, key=_plant_key)
+        self.image_refs = Counter(plant.image for plant in plants if plant.image)
+        # Index de recherche plein texte, construits à la première recherche
+        self.plant_search = None
+        self.note_search = None
+        # Agrégats des statistiques (GardenStats), construits à la première consultation
+        self.stats = None
+
+        # Les structures des notes ne sont construites que si les notes sont en mémoire
+        self.notes_by_id = None
+        self.notes_by_plant = None
+        self.notes_by_date = None
+        self.latest_notes = None
+        # Plantes dont la liste de notes est partagée avec une copie : recopiée avant toute modification
+        self._shared_plants = set()
+        if notes is not None:
+            self.index_notes(notes)
+
+    @property
+    def notes_indexed(self):
+        return self.notes_by_date is not None
+
+    def index_notes(self, notes):
+        """Construire les index des notes en un seul passage trié"""
+        notes_by_id = {}
+        notes_by_plant = {}
+        notes_by_date = sorted(notes, key=_note_key)
+        for note in notes_by_date:
+            notes_by_id[note.id] = note
+            notes_by_plant.setdefault(note.plant_id, []).append(note)
+            if note.image:
+                self.image_refs[note.image] += 1
+        self.notes_by_id = notes_by_id
+        self.notes_by_plant = notes_by_plant
+        self._shared_plants = set()
+        # Les listes par plante sont triées : la dernière note est en fin de liste
+        self.latest_notes = {plant_id: notes[-1] for plant_id, notes in notes_by_plant.items()}
+        self.notes_by_date = notes_by_date
+        self.note_search = None
+
+    def copy(self):
+        """Copie indépendante des structures (les enregistrements eux-mêmes sont partagés)"""
+        clone = GardenIndex.__new__(GardenIndex)
+        clone.plants_by_id = dict(self.plants_by_id)
+        clone.plants_by_date = list(self.plants_by_date)
+        clone.image_refs = Counter(self.image_refs)
+        clone.plant_search = self.plant_search.copy() if self.plant_search else None
+        clone.note_search = self.note_search.copy() if self.note_search else None
+        clone.stats = self.stats.copy() if self.stats else None
+        clone.notes_by_id = None
+        clone.notes_by_plant = None
+        clone.notes_by_date = None
+        clone.latest_notes = None
+        clone._shared_plants = set()
+        if self.notes_indexed:
+            clone.notes_by_id = dict(self.notes_by_id)
+            # Les listes par plante ne sont recopiées, de part et d'autre, qu'à leur première modification
+            clone.notes_by_plant = dict(self.notes_by_plant)
+            self._shared_plants = set(self.notes_by_plant)
+            clone._shared_plants = set(self.notes_by_plant)
+            clone.notes_by_date = list(self.notes_by_date)
+            clone.latest_notes = dict(self.latest_notes)
+        return clone
+
+    def search_plants(self, query):
+        """IDs des plantes correspondant à la recherche (None si la requête est vide)"""
+        if self.plant_search is None:
+            self.plant_search = SearchIndex.build(self.plants_by_date, PLANT_FIELDS)
+        return self.plant_search.search(query)
+
+    def search_notes(self, query):
+        """IDs des notes correspondant à la recherche (None si la requête est vide)"""
+        if self.note_search is None:
+            self.note_search = SearchIndex.build(self.notes_by_date, NOTE_FIELDS)
+        return self.note_search.search(query)
+
+    def recent_plants(self, limit=None):
+        return _newest_first(self.plants_by_date, limit)
+
+    def recent_notes(self, limit=None, plant_id=None, offset=0, start=None, end=None):
+        notes = self.notes_by_plant.get(plant_id, []) if plant_id else self.notes_by_date
+        # Fenêtre de dates trouvée par recherche dichotomique dans la liste triée
+        lo, hi = _day_bounds(notes, start, end)
+        return _newest_first(notes, limit, offset, lo, hi)
+
+    def count_notes(self, plant_id=None, start=None, end=None):
+        notes = self.notes_by_plant.get(plant_id, []) if plant_id else self.notes_by_date
+        lo, hi = _day_bounds(notes, start, end)
+        return max(0, hi - lo)
+
+    def add_plant(self, plant):
+        self.plants_by_id[plant.id] = plant
+        insort(self.plants_by_date, plant, key=_plant_key)
+        if plant.image:
+            self.image_refs[plant.image] += 1
+        if self.plant_search:
+            self.plant_search.add(plant)
+
+    def replace_plant(self, plant, updated):
+        self.plants_by_id[updated.id] = updated
+        _remove_sorted(self.plants_by_date, plant, _plant_key)
+        insort(self.plants_by_date, updated, key=_plant_key)
+        self._release(plant)
+        if updated.image:
+            self.image_refs[updated.image] += 1
+        if self.plant_search:
+            self.plant_search.remove(plant)
+            self.plant_search.add(updated)
+
+    def remove_plant(self, plant_id):
+        plant = self.plants_by_id.pop(plant_id, None)
+        if plant is None:
+            return
+        _remove_sorted(self.plants_by_date, plant, _plant_key)
+        self._release(plant)
+        if self.plant_search:
+            self.plant_search.remove(plant)
+        if self.notes_indexed:
+            for note in list(self.notes_by_plant.get(plant_id, [])):
+                self.remove_note(note.id)
+
+    def _plant_notes(self, plant_id):
+        """Notes d'une plante à modifier, recopiées si elles sont encore partagées avec une copie"""
+        if plant_id in self._shared_plants:
+            self._shared_plants.discard(plant_id)
+            self.notes_by_plant[plant_id] = list(self.notes_by_plant[plant_id])
+        return self.notes_by_plant.setdefault(plant_id, [])
+
+    def add_note(self, note):
+        if not self.notes_indexed:
+            return
+        self.notes_by_id[note.id] = note
+        insort(self.notes_by_date, note, key=_note_key)
+        plant_notes = self._plant_notes(note.plant_id)
+        insort(plant_notes, note, key=_note_key)
+        self.latest_notes[note.plant_id] = plant_notes[-1]
+        if note.image:
+            self.image_refs[note.image] += 1
+        if self.note_search:
+            self.note_search.add(note)
+
+    def remove_note(self, note_id):
+        if not self.notes_indexed:
+            return
+        note = self.notes_by_id.pop(note_id, None)
+        if note is None:
+            return
+        _remove_sorted(self.notes_by_date, note, _note_key)
+        plant_notes = self._plant_notes(note.plant_id)
+        _remove_sorted(plant_notes, note, _note_key)
+        if plant_notes:
+            self.latest_notes[note.plant_id] = plant_notes[-1]
+        else:
+            self.notes_by_plant.pop(note.plant_id, None)
+            self.latest_notes.pop(note.plant_id, None)
+        self._release(note)
+        if self.note_search:
+            self.note_search.remove(note)
+
+    def _release(self, record):
+        image = record.image
+        if image:
+            self.image_refs[image] -= 1
+            if self.image_refs[image] <= 0:
+                del self.image_refs[image]
@@ -0,0 +1,254 @@
+"""Service d'ingestion des relevés de capteurs, sans navigateur
+
+Les relevés reçus (POST /readings, JSON ou JSON-lines) sont mis en mémoire tampon puis
+enregistrés par lots dans le journal lu par l'application : les sessions Streamlit en cours
+les voient à leur prochaine exécution. Les écritures des deux processus sont sérialisées par un
+verrou de fichier dans le dossier des données (voir benchmarks/concurrency.py).
+
+Chaque relevé valide devient une note : contrairement à l'import de fichiers, les relevés d'une
+même plante le même jour sont tous gardés.
+
+Utilisation :
+    python ingest.py serve [--data-dir DOSSIER] [--port 8765]
+    python ingest.py stub [--url http://127.0.0.1:8765] [--rate 200] [--seconds 10]
+"""
+import argparse
+import datetime
+import http.client
+import json
+import random
+import signal
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+import pandas as pd
+
+from importer import ImportReport, add_batch, validate
+from storage import GardenStore, open_backend
+
+# Le tampon est enregistré dès qu'il atteint FLUSH_ROWS relevés, et au moins toutes les FLUSH_INTERVAL secondes
+FLUSH_ROWS = 1000
+FLUSH_INTERVAL = 1.0
+
+# Taille maximale d'une requête (octets)
+MAX_BODY_BYTES = 4 * 1024 * 1024
+
+
+class ReadingBuffer:
+    """Relevés reçus en attente d'enregistrement, vidés par lots dans le journal"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.store = GardenStore.open_shared(backend)
+        self.readings = []
+        self.report = ImportReport()
+        self.flushes = 0
+        self.last_flush = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+
+    def add(self, readings):
+        with self._lock:
+            self.readings.extend(readings)
+            full = len(self.readings) >= FLUSH_ROWS
+        if full:
+            self._wake.set()
+        return len(readings)
+
+    def flush(self):
+        """Enregistrer en une seule écriture les relevés en attente et renvoyer leur nombre"""
+        with self._flush_lock:
+            with self._lock:
+                readings, self.readings = self.readings, []
+            if not readings:
+                return 0
+            start = time.perf_counter()
+            # Reprendre les modifications faites entre-temps par l'application
+            self.store = self.store.refresh()
+            today = datetime.date.today().isoformat()
+            chunk = pd.DataFrame.from_records(readings)
+            if 'date' not in chunk:
+                chunk['date'] = today
+            chunk['date'] = chunk['date'].fillna(today)
+            frame = validate(chunk, list(self.store.index.plants_by_id), self.report)
+            # Un capteur envoie plusieurs relevés par jour : pas de dédoublonnage (plante, jour)
+            add_batch(self.store, frame, self.report, dedupe=False)
+            self.store.flush()
+            self.flushes += 1
+            self.last_flush = datetime.datetime.now().isoformat(timespec='seconds')
+            self.report.seconds += time.perf_counter() - start
+            return len(readings)
+
+    def run(self, stop):
+        """Boucle d'enregistrement périodique (thread dédié), jusqu'à ce que stop soit levé"""
+        while not stop.is_set():
+            self._wake.wait(FLUSH_INTERVAL)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Erreur lors de l'enregistrement des relevés: {str(e)}")
+        self.flush()
+
+    def status(self):
+        with self._lock:
+            buffered = len(self.readings)
+        return {
+            'buffered': buffered,
+            'received': self.report.rows + buffered,
+            'imported': self.report.imported,
+            'rejected': self.report.rejected,
+            'flushes': self.flushes,
+            'last_flush': self.last_flush,
+        }
+
+
+def parse_readings(body):
+    """Relevés d'une requête : un objet JSON, une liste d'objets ou des lignes JSON"""
+    text = body.decode('utf-8').strip()
+    if not text:
+        return []
+    try:
+        data = json.loads(text)
+    except ValueError:
+        data = [json.loads(line) for line in text.splitlines() if line.strip()]
+    readings = data if isinstance(data, list) else [data]
+    if not all(isinstance(reading, dict) for reading in readings):
+        raise ValueError("chaque relevé doit être un objet JSON")
+    return readings
+
+
+class IngestHandler(BaseHTTPRequestHandler):
+    # Connexions persistantes : un capteur peut envoyer ses relevés sans reconnecter
+    protocol_version = 'HTTP/1.1'
+    # Sans Nagle : les petites réponses partent immédiatement (sinon ~40 ms d'attente par requête)
+    disable_nagle_algorithm = True
+    buffer = None
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        if self.path != '/readings':
+            return self._reply(404, {'error': "ressource inconnue"})
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > MAX_BODY_BYTES:
+            return self._reply(413, {'error': "requête trop volumineuse"})
+        try:
+            readings = parse_readings(self.rfile.read(length))
+        except ValueError as e:
+            return self._reply(400, {'error': f"JSON invalide : {str(e)}"})
+        self._reply(202, {'accepted': self.buffer.add(readings)})
+
+    def do_GET(self):
+        if self.path == '/health':
+            return self._reply(200, self.buffer.status())
+        if self.path == '/plants':
+            plants = self.buffer.store.plants
+            return self._reply(200, [{'id': p.id, 'name': p.name} for p in plants])
+        self._reply(404, {'error': "ressource inconnue"})
+
+    def log_message(self, format, *args):
+        # Une ligne par requête ralentirait le service : seules les erreurs sont affichées
+        pass
+
+
+def serve(data_dir='.', host='127.0.0.1', port=8765, backend=None):
+    """Lancer le service jusqu'à Ctrl+C ; les relevés en attente sont enregistrés avant l'arrêt"""
+    buffer = ReadingBuffer(open_backend(backend, data_dir))
+    handler = type('Handler', (IngestHandler,), {'buffer': buffer})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+
+    stop = threading.Event()
+    flusher = threading.Thread(target=buffer.run, args=(stop,), name='ingest-flush')
+    flusher.start()
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown).start())
+
+    print(f"Ingestion des relevés sur http://{host}:{port}/readings (données : {data_dir})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        stop.set()
+        flusher.join()
+        print(json.dumps(buffer.status(), ensure_ascii=False))
+
+
+def stub(url='http://127.0.0.1:8765', rate=200, seconds=10, batch=1, seed=0):
+    """Client de test : envoie des relevés aléatoires au rythme demandé et affiche le débit obtenu"""
+    parts = urlsplit(url)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port or 80)
+
+    def request(method, path, payload=None):
+        body = json.dumps(payload).encode('utf-8') if payload is not None else None
+        conn.request(method, path, body=body, headers={'Content-Type': 'application/json'})
+        response = conn.getresponse()
+        return response.status, json.loads(response.read())
+
+    _, plants = request('GET', '/plants')
+    if not plants:
+        print("Aucune plante dans le journal : ajoutez-en avant d'envoyer des relevés.")
+        return 1
+    rng = random.Random(seed)
+    sent = errors = 0
+    began = time.perf_counter()
+    while time.perf_counter() - began < seconds:
+        readings = [{
+            # Comme un vrai capteur : des relevés du jour, sans date (le service date du jour)
+            'plantId': rng.choice(plants)['id'],
+            'height': round(rng.uniform(1, 150), 1),
+            'leaves': rng.randrange(1, 200),
+            'content': "Relevé automatique",
+        } for _ in range(batch)]
+        status, _ = request('POST', '/readings', readings)
+        sent += len(readings)
+        errors += status != 202
+        # Cadence : attendre l'instant prévu pour le prochain envoi
+        delay = began + sent / rate - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+    elapsed = time.perf_counter() - began
+    print(f"{sent} relevés envoyés en {elapsed:.1f} s ({sent / elapsed:.0f}/s), {errors} erreurs")
+    time.sleep(FLUSH_INTERVAL * 2)
+    print(json.dumps(request('GET', '/health')[1], ensure_ascii=False))
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Service d'ingestion des relevés de capteurs")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    serve_parser = commands.add_parser('serve', help="Lancer le service")
+    serve_parser.add_argument('--data-dir', default='.', help="Dossier des données du jardin")
+    serve_parser.add_argument('--host', default='127.0.0.1')
+    serve_parser.add_argument('--port', type=int, default=8765)
+    serve_parser.add_argument('--backend', help="Moteur de stockage (GARDEN_BACKEND par défaut)")
+
+    stub_parser = commands.add_parser('stub', help="Envoyer des relevés de test")
+    stub_parser.add_argument('--url', default='http://127.0.0.1:8765')
+    stub_parser.add_argument('--rate', type=float, default=200, help="Relevés par seconde")
+    stub_parser.add_argument('--seconds', type=float, default=10)
+    stub_parser.add_argument('--batch', type=int, default=1, help="Relevés par requête")
+    stub_parser.add_argument('--seed', type=int, default=0)
+
+    args = parser.parse_args(argv)
+    if args.command == 'serve':
+        serve(args.data_dir, args.host, args.port, args.backend)
+        return 0
+    return stub(args.url, args.rate, args.seconds, args.batch, args.seed)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,354 @@
+"""Migration du journal JSON vers la base SQLite ou vers les notes partitionnées
+
+Les fichiers JSON sont lus élément par élément, sans jamais être chargés en entier : la mémoire
+utilisée ne dépend pas de leur taille. Les photos base64 intégrées sont extraites et réencodées au
+passage. La progression est enregistrée après chaque lot dans un fichier de reprise : une migration
+interrompue reprend là où elle s'était arrêtée. À la fin, le nombre d'enregistrements et une somme
+de contrôle sont vérifiés sur la destination.
+
+Utilisation : python migrate.py [dossier_des_données] [--target sqlite|partitioned] [--restart] [--verify]
+"""
+import argparse
+import base64
+import codecs
+import hashlib
+import io
+import json
+import os
+import re
+import sys
+from contextlib import closing
+from itertools import groupby
+
+from images import BlobStore, PHOTOS_DIR, encode_photo
+from records import Note, Plant
+from storage import (JsonBackend, NOTES_DIR, SqliteBackend, SQLITE_FILE, open_backend, partition_key, read_json,
+                     write_json)
+
+# Fichier de reprise, dans le dossier des données
+CHECKPOINT_FILE = 'migration.{target}.json'
+
+# Base intermédiaire des notes destinées aux partitions (supprimée à la fin)
+STAGING_FILE = 'migration.partitioned.db'
+
+# Enregistrements écrits par transaction (la progression est enregistrée après chacune)
+BATCH_RECORDS = 1000
+
+# Taille des lectures dans les fichiers JSON
+READ_CHUNK_BYTES = 1024 * 1024
+
+# Taille maximale d'un élément (une note avec sa photo base64) : au-delà, le fichier est jugé corrompu
+MAX_ELEMENT_BYTES = 64 * 1024 * 1024
+
+# Blancs et virgules entre les éléments d'un tableau
+_SEPARATORS = re.compile(r'[\s,]*')
+
+
+def iter_json_array(path, offset=0, chunk_size=READ_CHUNK_BYTES):
+    """Parcourir les éléments d'un tableau JSON : (élément, position en octets juste après lui)
+
+    Le fichier est lu par blocs et seul l'élément en cours est gardé en mémoire. offset est une
+    position renvoyée lors d'un parcours précédent, pour reprendre après l'élément correspondant.
+    """
+    if not os.path.exists(path):
+        return
+    decoder = json.JSONDecoder()
+    # Un caractère UTF-8 coupé entre deux blocs est complété par le bloc suivant
+    utf8 = codecs.getincrementaldecoder('utf-8')()
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        text = ''
+        mark = 0   # texte déjà rendu (offset est la position dans le fichier de ce point)
+        pos = 0    # prochain caractère à examiner
+        opened = offset > 0
+        eof = False
+        while True:
+            pos = _SEPARATORS.match(text, pos).end()
+            if pos < len(text):
+                char = text[pos]
+                if not opened:
+                    if char != '[':
+                        raise ValueError(f"{path} ne contient pas un tableau JSON")
+                    opened = True
+                    pos += 1
+                    continue
+                if char == ']':
+                    return
+                if char not in '{[':
+                    raise ValueError(f"{path} : élément inattendu à l'octet {offset}")
+                try:
+                    element, end = decoder.raw_decode(text, pos)
+                except json.JSONDecodeError:
+                    # Élément coupé par la fin du bloc : il est relu avec le suivant
+                    if eof or len(text) - pos > MAX_ELEMENT_BYTES:
+                        raise ValueError(f"{path} : JSON invalide ou tronqué à l'octet {offset}")
+                else:
+                    offset += len(text[mark:end].encode('utf-8'))
+                    mark = pos = end
+                    yield element, offset
+                    continue
+            elif eof:
+                if opened:
+                    raise ValueError(f"{path} : tableau JSON tronqué à l'octet {offset}")
+                return
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            # Le texte déjà rendu est libéré
+            text = text[mark:] + utf8.decode(chunk, final=eof)
+            pos -= mark
+            mark = 0
+
+
+def extract_photo(image, blobs, state):
+    """Extraire une photo base64 intégrée (ancien format), la réencoder et renvoyer sa référence"""
+    if not (isinstance(image, str) and image.startswith('data:')):
+        return image
+    state['photos'] += 1
+    try:
+        data = base64.b64decode(image.split(',', 1)[1])
+    except (IndexError, ValueError):
+        # Base64 illisible : la valeur d'origine reste dans l'enregistrement, la migration continue
+        state['photo_errors'] += 1
+        return image
+    try:
+        data = encode_photo(io.BytesIO(data))
+    except (OSError, ValueError):
+        # Image illisible : elle est conservée telle quelle plutôt que perdue
+        state['photo_errors'] += 1
+    return blobs.put(data)
+
+
+def record_checksum(record):
+    """Empreinte d'un enregistrement ; leur somme ne dépend pas de l'ordre de lecture"""
+    canonical = json.dumps(record.to_dict(), sort_keys=True, ensure_ascii=False)
+    return int.from_bytes(hashlib.sha256(canonical.encode('utf-8')).digest()[:16], 'big')
+
+
+def _tally(state, collection, record):
+    entry = state[collection]
+    entry['count'] += 1
+    entry['checksum'] = f"{(int(entry['checksum'], 16) + record_checksum(record)) % 2 ** 128:032x}"
+
+
+def iter_target(backend, collection):
+    """Parcourir les enregistrements migrés dans la destination, sans les charger tous"""
+    record = Plant if collection == 'plants' else Note
+    if isinstance(backend, SqliteBackend):
+        with closing(backend.connect()) as conn:
+            for (data,) in conn.execute(f"SELECT data FROM {collection}"):
+                yield record.from_dict(json.loads(data))
+    elif collection == 'plants':
+        yield from backend.load_plants()
+    else:
+        for key in backend.manifest():
+            yield from map(Note.from_dict, backend.read_partition(key))
+
+
+def _log_changes(path):
+    """État final des notes modifiées dans le journal JSON : ID -> note (None : supprimée)
+
+    Le journal est fusionné dans l'instantané dès qu'il dépasse 1 Mo : il reste petit.
+    """
+    final = {}
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if entry['op'] == 'put':
+                    final[entry['note']['id']] = entry['note']
+                else:
+                    final[entry['id']] = None
+    return final
+
+
+def _clear(backend):
+    with closing(backend.connect()) as conn:
+        with conn:
+            conn.execute("DELETE FROM notes")
+            conn.execute("DELETE FROM plants")
+
+
+def _staged_partitions(staging):
+    """Partitions de la base intermédiaire, dans l'ordre de son index (plante, date) : une à la fois"""
+    with closing(staging.connect()) as conn:
+        rows = conn.execute("SELECT data FROM notes ORDER BY plantId, date")
+        notes = (Note.from_dict(json.loads(data)) for (data,) in rows)
+        for key, group in groupby(notes, key=partition_key):
+            yield key, [note.to_dict() for note in group]
+
+
+def migrate(data_dir='.', target='sqlite', restart=False, log=print):
+    """Migrer le journal JSON vers target, en reprenant une migration interrompue ; renvoie son état
+
+    Étapes : plantes, notes de l'instantané (par lots), notes du journal, puis, vers les partitions,
+    écriture de chaque partition. Les notes destinées aux partitions passent par une base SQLite
+    intermédiaire : une partition n'est écrite qu'une fois, quel que soit l'ordre des notes.
+    """
+    source = JsonBackend(data_dir)
+    backend = open_backend(target, data_dir)
+    blobs = BlobStore(os.path.join(data_dir, PHOTOS_DIR))
+    checkpoint_path = os.path.join(data_dir, CHECKPOINT_FILE.format(target=target))
+    signature = json.loads(json.dumps(source.signature()))
+
+    state = read_json(checkpoint_path, None)
+    if state is not None and not restart and state['stage'] != 'done' and state['source'] != signature:
+        log("Les fichiers JSON ont changé depuis la migration interrompue : elle reprend du début.")
+    fresh = state is None or restart or state['source'] != signature
+    if not fresh and state['stage'] == 'done':
+        log("Migration déjà terminée.")
+        return state
+
+    staging = SqliteBackend(data_dir, STAGING_FILE) if target == 'partitioned' else backend
+    if fresh:
+        state = {
+            'source': signature,
+            'stage': 'plants',
+            'offset': 0,
+            'plants': {'count': 0, 'checksum': '0'},
+            'notes': {'count': 0, 'checksum': '0'},
+            'photos': 0,
+            'photo_errors': 0,
+            'rejected': 0,
+        }
+        _clear(staging)
+    else:
+        log(f"Reprise de la migration : {state['notes']['count']} notes déjà migrées.")
+
+    def save(stage, offset=0):
+        state['stage'], state['offset'] = stage, offset
+        write_json(checkpoint_path, state)
+
+    # Plantes : peu nombreuses une fois leurs photos extraites, écrites en une seule transaction
+    if state['stage'] == 'plants':
+        plants = []
+        for data, _ in iter_json_array(source.plants_path):
+            plant = Plant.from_dict(data)
+            plant.image = extract_photo(plant.image, blobs, state)
+            plants.append(plant)
+            _tally(state, 'plants', plant)
+        staging.commit([('plants', 'put', plant) for plant in plants], plants, [])
+        log(f"{len(plants)} plantes migrées.")
+        save('notes')
+
+    # Les notes modifiées dans le journal sont reprises dans leur dernier état, à la fin
+    log_changes = _log_changes(source.log_path)
+
+    # Les écritures sont idempotentes : un lot écrit mais pas enregistré dans la reprise est simplement réécrit
+    if state['stage'] == 'notes':
+        total = os.path.getsize(source.notes_path) if os.path.exists(source.notes_path) else 0
+        batch = []
+        offset = state['offset']
+        reported = offset * 10 // total if total else 0
+        for data, end in iter_json_array(source.notes_path, state['offset']):
+            offset = end
+            if data.get('id') in log_changes:
+                continue
+            try:
+                note = Note.from_dict(data)
+            except (KeyError, TypeError, ValueError):
+                state['rejected'] += 1
+                continue
+            note.image = extract_photo(note.image, blobs, state)
+            batch.append(('notes', 'put', note))
+            _tally(state, 'notes', note)
+            if len(batch) >= BATCH_RECORDS:
+                staging.commit(batch, [], [])
+                batch = []
+                save('notes', offset)
+                if offset * 10 // total > reported:
+                    reported = offset * 10 // total
+                    log(f"{state['notes']['count']} notes migrées ({reported * 10} %)")
+        staging.commit(batch, [], [])
+        save('log')
+
+    if state['stage'] == 'log':
+        batch = []
+        for data in log_changes.values():
+            if data is None:
+                continue
+            note = Note.from_dict(data)
+            note.image = extract_photo(note.image, blobs, state)
+            batch.append(('notes', 'put', note))
+            _tally(state, 'notes', note)
+        staging.commit(batch, [], [])
+        save('partitions' if target == 'partitioned' else 'done')
+
+    if state['stage'] == 'partitions':
+        backend.replace_partitions(staging.load_plants(), _staged_partitions(staging))
+        # Le fichier des plantes, réécrit sur place, fait partie de la source : sa nouvelle empreinte est gardée
+        state['source'] = json.loads(json.dumps(source.signature()))
+        save('done')
+        os.remove(staging.path)
+        log(f"{len(backend.manifest())} partitions écrites.")
+
+    return state
+
+
+def verify(data_dir='.', target='sqlite'):
+    """Comparer la destination aux nombres et sommes de contrôle de la migration ; renvoie les écarts"""
+    state = read_json(os.path.join(data_dir, CHECKPOINT_FILE.format(target=target)), None)
+    if state is None or state['stage'] != 'done':
+        return ["aucune migration terminée vers cette destination"]
+    backend = open_backend(target, data_dir)
+    problems = []
+    for collection in ('plants', 'notes'):
+        found = {collection: {'count': 0, 'checksum': '0'}}
+        for record in iter_target(backend, collection):
+            _tally(found, collection, record)
+        expected = state[collection]
+        if found[collection] != expected:
+            problems.append(f"{collection} : {found[collection]['count']} enregistrements "
+                            f"(somme {found[collection]['checksum']}), attendu {expected['count']} "
+                            f"(somme {expected['checksum']})")
+    return problems
+
+
+def migrate_json_to_sqlite(data_dir='.'):
+    """Copier les plantes et les notes des fichiers JSON dans la base SQLite"""
+    state = migrate(data_dir, 'sqlite')
+    return state['plants']['count'], state['notes']['count']
+
+
+def migrate_json_to_partitions(data_dir='.'):
+    """Répartir les notes des fichiers JSON en partitions par plante et par mois"""
+    state = migrate(data_dir, 'partitioned')
+    return state['plants']['count'], state['notes']['count']
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Migrer le journal JSON vers SQLite ou vers des partitions")
+    parser.add_argument('data_dir', nargs='?', default='.', help="Dossier contenant les fichiers JSON")
+    parser.add_argument('--target', choices=('sqlite', 'partitioned'), default='sqlite',
+                        help="Moteur de stockage de destination")
+    parser.add_argument('--restart', action='store_true',
+                        help="Recommencer depuis le début au lieu de reprendre une migration interrompue")
+    parser.add_argument('--verify', action='store_true',
+                        help="Vérifier seulement une migration terminée")
+    args = parser.parse_args(argv)
+
+    if not args.verify:
+        state = migrate(args.data_dir, args.target, args.restart)
+        if args.target == 'partitioned':
+            destination = os.path.join(args.data_dir, NOTES_DIR)
+        else:
+            destination = os.path.join(args.data_dir, SQLITE_FILE)
+        print(f"{state['plants']['count']} plantes et {state['notes']['count']} notes migrées vers {destination} "
+              f"({state['photos']} photos extraites, {state['photo_errors']} illisibles conservées telles quelles, "
+              f"{state['rejected']} notes invalides ignorées)")
+
+    problems = verify(args.data_dir, args.target)
+    if problems:
+        for problem in problems:
+            print(f"Écart : {problem}")
+        return 1
+    print("Vérification réussie : nombres d'enregistrements et sommes de contrôle identiques.")
+    if not args.verify:
+        print(f"Lancez l'application avec GARDEN_BACKEND={args.target} pour utiliser ce stockage.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,157 @@
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Variable d'environnement activant le profilage (sinon : paramètre d'URL ?profile=1)
+PROFILE_ENV = 'GARDEN_PROFILE'
+PROFILE_LOG_FILE = 'garden_profile.jsonl'
+
+# Taille au-delà de laquelle le journal de profilage est archivé (une seule archive conservée)
+PROFILE_LOG_BYTES = 1024 * 1024
+
+# Profileur de l'exécution en cours : chaque session Streamlit exécute le script dans son propre thread
+_current = threading.local()
+_log_lock = threading.Lock()
+
+
+class Profiler:
+    """Mesures d'une exécution du script : durées par étape et par appel, compteurs d'octets et d'images"""
+
+    def __init__(self, enabled=False, run=None):
+        self.enabled = enabled
+        # Exécution mesurée : None pour le script complet, le nom du fragment sinon
+        self.run = run
+        # Le rapport a-t-il été produit ? (les mesures suivantes appartiennent à une autre exécution)
+        self.finished = False
+        self.started = time.perf_counter()
+        # nom -> [durée cumulée (secondes), nombre d'appels]
+        self.timings = {}
+        self.counters = {}
+        self._lap_name = None
+        self._lap_start = self.started
+
+    @classmethod
+    def start(cls, enabled, run=None):
+        """Créer le profileur de l'exécution et le rendre courant pour ce thread"""
+        profiler = cls(enabled, run)
+        _current.profiler = profiler
+        return profiler
+
+    def record(self, name, seconds):
+        timing = self.timings.setdefault(name, [0.0, 0])
+        timing[0] += seconds
+        timing[1] += 1
+
+    def count(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    @contextmanager
+    def section(self, name):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def lap(self, name=None):
+        """Clore l'étape en cours du script et en commencer une nouvelle (None : aucune)"""
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        if self._lap_name:
+            self.record(self._lap_name, now - self._lap_start)
+        self._lap_name, self._lap_start = name, now
+
+    def report(self):
+        """Résultats de l'exécution, durées en millisecondes"""
+        self.lap()
+        self.finished = True
+        report = {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'total_ms': round((time.perf_counter() - self.started) * 1000, 3),
+            'timings': {name: {'ms': round(seconds * 1000, 3), 'calls': calls}
+                        for name, (seconds, calls) in self.timings.items()},
+            'counters': dict(self.counters),
+        }
+        if self.run:
+            report['run'] = self.run
+        return report
+
+
+def current():
+    """Profileur de l'exécution en cours dans ce thread (None hors d'une exécution profilée)"""
+    profiler = getattr(_current, 'profiler', None)
+    return profiler if profiler is not None and profiler.enabled and not profiler.finished else None
+
+
+def count(name, amount=1):
+    """Incrémenter un compteur de l'exécution en cours, si le profilage est actif"""
+    profiler = current()
+    if profiler:
+        profiler.count(name, amount)
+
+
+def timed(name):
+    """Décorateur : chronométrer chaque appel de la fonction quand le profilage est actif"""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            profiler = current()
+            if profiler is None:
+                return function(*args, **kwargs)
+            with profiler.section(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def timed_fragment(name, query_params=None):
+    """Décorateur des fragments Streamlit
+
+    Appelé pendant une exécution complète, le fragment y est chronométré comme une étape ;
+    réexécuté seul, il est profilé comme une exécution à part entière, dont le rapport est ajouté
+    au journal de profilage.
+    """
+    def decorator(function):
+        timed_function = timed(name)(function)
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if current() is not None or not is_enabled(query_params):
+                return timed_function(*args, **kwargs)
+            profiler = Profiler.start(True, run=name)
+            try:
+                return timed_function(*args, **kwargs)
+            finally:
+                try:
+                    write_log(profiler.report())
+                except OSError as e:
+                    print(f"Erreur d'écriture du journal de profilage: {str(e)}")
+        return wrapper
+    return decorator
+
+
+def is_enabled(query_params=None):
+    """Profilage demandé par la variable d'environnement ou par le paramètre d'URL ?profile=1"""
+    if os.environ.get(PROFILE_ENV, '').lower() in ('1', 'true', 'yes', 'on'):
+        return True
+    return query_params is not None and query_params.get('profile') in ('1', 'true')
+
+
+def write_log(report, path=PROFILE_LOG_FILE):
+    """Ajouter une ligne au journal de profilage (JSON-lines), archivé en .1 quand il devient trop gros"""
+    line = json.dumps(report, ensure_ascii=False) + '\n'
+    with _log_lock:
+        try:
+            if os.path.getsize(path) > PROFILE_LOG_BYTES:
+                os.replace(path, path + '.1')
+        except FileNotFoundError:
+            pass
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(line)
@@ -0,0 +1,131 @@
+"""Enregistrements typés du journal : plantes et notes
+
+Les dates sont lues une seule fois et conservées comme numéros de jour (date.toordinal()) ;
+leur forme texte (AAAA-MM-JJ) est mise en cache et partagée par tous les enregistrements du
+même jour. from_dict() et to_dict() gardent le format JSON des fichiers du journal.
+"""
+import sys
+from dataclasses import dataclass
+from datetime import date
+from functools import lru_cache
+
+# dataclass(slots=True) et annotations « X | None » ici, bisect(key=) dans index.py
+if sys.version_info < (3, 10):
+    raise ImportError("Le journal du jardin nécessite Python 3.10 ou plus récent")
+
+# Clés JSON connues ; les autres sont conservées telles quelles dans `extra`
+PLANT_KEYS = frozenset(('id', 'name', 'variety', 'container', 'soil', 'date', 'location', 'notes', 'image'))
+NOTE_KEYS = frozenset(('id', 'plantId', 'date', 'content', 'height', 'leaves', 'image'))
+
+
+@lru_cache(maxsize=65536)
+def parse_day(text):
+    """Numéro de jour d'une date AAAA-MM-JJ"""
+    return date.fromisoformat(text).toordinal()
+
+
+@lru_cache(maxsize=65536)
+def iso_day(day):
+    """Date AAAA-MM-JJ d'un numéro de jour"""
+    return date.fromordinal(day).isoformat()
+
+
+def to_day(value):
+    """Numéro de jour d'une date (texte AAAA-MM-JJ, date ou numéro de jour)"""
+    if isinstance(value, int):
+        return value
+    if isinstance(value, date):
+        return value.toordinal()
+    return parse_day(value)
+
+
+def _extra(data, keys):
+    if data.keys() <= keys:
+        return None
+    return {key: value for key, value in data.items() if key not in keys}
+
+
+@dataclass(slots=True)
+class Plant:
+    id: str
+    name: str
+    day: int
+    variety: str | None = None
+    container: str | None = None
+    soil: str | None = None
+    location: str | None = None
+    notes: str | None = None
+    image: str | None = None
+    extra: dict | None = None
+
+    @property
+    def date(self):
+        return iso_day(self.day)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['id'], data.get('name', ''), parse_day(data['date']), data.get('variety'),
+                   data.get('container'), data.get('soil'), data.get('location'), data.get('notes'),
+                   data.get('image'), _extra(data, PLANT_KEYS))
+
+    def to_dict(self):
+        data = {
+            'id': self.id,
+            'name': self.name,
+            'variety': self.variety,
+            'container': self.container,
+            'soil': self.soil,
+            'date': self.date,
+            'location': self.location,
+            'notes': self.notes,
+            'image': self.image,
+        }
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+
+@dataclass(slots=True)
+class Note:
+    id: str
+    plant_id: str
+    day: int
+    content: str = ''
+    height: float | None = None
+    leaves: int | None = None
+    image: str | None = None
+    extra: dict | None = None
+
+    @property
+    def date(self):
+        return iso_day(self.day)
+
+    @property
+    def measured(self):
+        """La note porte-t-elle une mesure (hauteur ou nombre de feuilles) ?"""
+        return bool(self.height or self.leaves)
+
+    @classmethod
+    def from_dict(cls, data):
+        height = data.get('height')
+        leaves = data.get('leaves')
+        # L'ID de plante est répété dans toutes ses notes : une seule chaîne en mémoire
+        return cls(data['id'], sys.intern(data['plantId']), parse_day(data['date']),
+                   data.get('content') or '',
+                   float(height) if height is not None else None,
+                   int(leaves) if leaves is not None else None,
+                   data.get('image'), _extra(data, NOTE_KEYS))
+
+    def to_dict(self):
+        data = {
+            'id': self.id,
+            'plantId': self.plant_id,
+            'date': self.date,
+            'content': self.content,
+            'height': self.height,
+            'leaves': self.leaves,
+            'image': self.image,
+        }
+        if self.extra:
+            data.update(self.extra)
+        return data
@@ -0,0 +1,111 @@
+import re
+import unicodedata
+from bisect import bisect_left, insort
+
+# Champs indexés pour la recherche
+PLANT_FIELDS = ('name', 'variety', 'soil', 'location', 'notes')
+NOTE_FIELDS = ('content',)
+
+_WORD_RE = re.compile(r'\w+')
+_COMBINING_RE = re.compile(r'[\u0300-\u036f]')
+
+
+def fold(text):
+    """Mettre en minuscules et retirer les accents (« Été » -> « ete », « cœur » -> « coeur »)"""
+    text = text.lower()
+    if text.isascii():
+        return text
+    # Les ligatures françaises ne sont pas séparées par la décomposition Unicode
+    text = text.replace('œ', 'oe').replace('æ', 'ae')
+    return _COMBINING_RE.sub('', unicodedata.normalize('NFKD', text))
+
+
+def tokenize(text):
+    """Découper un texte en mots normalisés"""
+    return _WORD_RE.findall(fold(text)) if text else []
+
+
+def record_text(record, fields):
+    """Texte indexable d'un enregistrement"""
+    return ' '.join(str(value) for value in (getattr(record, field) for field in fields) if value)
+
+
+class SearchIndex:
+    """Index inversé mot -> IDs, avec recherche par préfixe et mise à jour incrémentale"""
+
+    def __init__(self, fields):
+        self.fields = fields
+        self.postings = {}
+        # Mots dont l'ensemble d'IDs est partagé avec une copie : recopié avant toute modification
+        self._shared = set()
+        # Vocabulaire trié : les mots d'un même préfixe sont contigus
+        self.vocabulary = []
+
+    @classmethod
+    def build(cls, records, fields):
+        index = cls(fields)
+        for record in records:
+            index.add(record)
+        return index
+
+    def _own(self, token):
+        """Ensemble d'IDs d'un mot, recopié s'il est encore partagé avec une copie"""
+        ids = self.postings[token]
+        if token in self._shared:
+            self._shared.discard(token)
+            ids = self.postings[token] = set(ids)
+        return ids
+
+    def _tokens(self, record):
+        return set(tokenize(record_text(record, self.fields)))
+
+    def add(self, record):
+        for token in self._tokens(record):
+            if token in self.postings:
+                ids = self._own(token)
+            else:
+                ids = self.postings[token] = set()
+                insort(self.vocabulary, token)
+            ids.add(record.id)
+
+    def remove(self, record):
+        """Retirer un enregistrement tel qu'il a été indexé (les enregistrements ne sont jamais modifiés en place)"""
+        for token in self._tokens(record):
+            if token not in self.postings:
+                continue
+            ids = self._own(token)
+            ids.discard(record.id)
+            if not ids:
+                del self.postings[token]
+                del self.vocabulary[bisect_left(self.vocabulary, token)]
+
+    def _prefix_matches(self, prefix):
+        """IDs des enregistrements contenant un mot qui commence par le préfixe"""
+        matches = set()
+        i = bisect_left(self.vocabulary, prefix)
+        while i < len(self.vocabulary) and self.vocabulary[i].startswith(prefix):
+            matches |= self.postings[self.vocabulary[i]]
+            i += 1
+        return matches
+
+    def search(self, query):
+        """IDs des enregistrements contenant tous les mots de la requête (en préfixe) ; None si requête vide"""
+        tokens = sorted(set(tokenize(query)), key=len, reverse=True)
+        if not tokens:
+            return None
+        # Le mot le plus long est le plus sélectif : on part de ses résultats
+        result = self._prefix_matches(tokens[0])
+        for token in tokens[1:]:
+            if not result:
+                break
+            result &= self._prefix_matches(token)
+        return result
+
+    def copy(self):
+        """Copie indépendante : les ensembles d'IDs ne sont recopiés, de part et d'autre, qu'à leur première modification"""
+        clone = SearchIndex(self.fields)
+        clone.postings = dict(self.postings)
+        self._shared = set(self.postings)
+        clone._shared = set(self.postings)
+        clone.vocabulary = list(self.vocabulary)
+        return clone
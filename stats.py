@@ -0,0 +1,143 @@
+import json
+import os
+import threading
+from bisect import bisect_left, insort
+from collections import Counter
+
+STATS_FILE = 'garden_stats.json'
+
+
+def _point(note):
+    """Mesure d'une note : (date, ID, hauteur, feuilles), ou None si elle n'a aucune mesure"""
+    if not note.measured:
+        return None
+    return (note.date, note.id, note.height, note.leaves)
+
+
+class GardenStats:
+    """Agrégats de la page Statistiques, tenus à jour à chaque modification du journal"""
+
+    def __init__(self):
+        # plantId -> mesures triées par date : [(date, ID de la note, hauteur, feuilles), ...]
+        self.measurements = {}
+        self.varieties = Counter()
+        self.containers = Counter()
+        # Plantes dont la liste de mesures est partagée avec une copie : recopiée avant toute modification
+        self._shared = set()
+        # Table pandas des mesures, reconstruite à la demande après chaque changement
+        self._frame = None
+
+    @classmethod
+    def build(cls, plants, notes):
+        stats = cls()
+        for plant in plants:
+            stats.add_plant(plant)
+        for note in notes:
+            point = _point(note)
+            if point:
+                stats.measurements.setdefault(note.plant_id, []).append(point)
+        for points in stats.measurements.values():
+            points.sort()
+        return stats
+
+    def _count_plant(self, plant, delta):
+        variety = plant.variety if plant.variety is not None else 'Non spécifiée'
+        for counter, value in ((self.varieties, variety), (self.containers, plant.container)):
+            counter[value] += delta
+            if counter[value] <= 0:
+                del counter[value]
+
+    def add_plant(self, plant):
+        self._count_plant(plant, 1)
+
+    def replace_plant(self, plant, updated):
+        self._count_plant(plant, -1)
+        self._count_plant(updated, 1)
+
+    def remove_plant(self, plant):
+        self._count_plant(plant, -1)
+        self._shared.discard(plant.id)
+        if self.measurements.pop(plant.id, None):
+            self._frame = None
+
+    def _points(self, plant_id):
+        """Mesures d'une plante, recopiées si elles sont encore partagées avec une copie"""
+        points = self.measurements.get(plant_id)
+        if plant_id in self._shared:
+            self._shared.discard(plant_id)
+            points = self.measurements[plant_id] = list(points)
+        return points
+
+    def add_note(self, note):
+        point = _point(note)
+        if point:
+            points = self._points(note.plant_id)
+            if points is None:
+                points = self.measurements[note.plant_id] = []
+            insort(points, point)
+            self._frame = None
+
+    def remove_note(self, note):
+        point = _point(note)
+        if not point or not self.measurements.get(note.plant_id):
+            return
+        points = self._points(note.plant_id)
+        i = bisect_left(points, point[:2])
+        if i < len(points) and points[i][1] == note.id:
+            del points[i]
+            self._frame = None
+        if not points:
+            del self.measurements[note.plant_id]
+
+    @property
+    def frame(self):
+        """Mesures en colonnes (voir analytics.growth_frame), construites une fois par version des données"""
+        if self._frame is None:
+            from analytics import growth_frame
+            self._frame = growth_frame(self.measurements)
+        return self._frame
+
+    def copy(self):
+        clone = GardenStats()
+        # Les listes de mesures ne sont recopiées, de part et d'autre, qu'à leur première modification
+        clone.measurements = dict(self.measurements)
+        self._shared = set(self.measurements)
+        clone._shared = set(self.measurements)
+        clone.varieties = Counter(self.varieties)
+        clone.containers = Counter(self.containers)
+        # La table n'est jamais modifiée en place : elle peut être partagée
+        clone._frame = self._frame
+        return clone
+
+    def save(self, data_dir, signature):
+        """Enregistrer les agrégats avec l'empreinte des données dont ils sont issus"""
+        data = {
+            'signature': signature,
+            'measurements': self.measurements,
+            'varieties': list(self.varieties.items()),
+            'containers': list(self.containers.items()),
+        }
+        path = os.path.join(data_dir, STATS_FILE)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, data_dir, signature):
+        """Relire les agrégats enregistrés, s'ils correspondent encore aux données (sinon None)"""
+        path = os.path.join(data_dir, STATS_FILE)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        # Les tuples de l'empreinte deviennent des listes en JSON
+        if data.get('signature') != json.loads(json.dumps(signature)):
+            return None
+        stats = cls()
+        stats.measurements = {plant_id: [tuple(p) for p in points]
+                              for plant_id, points in data['measurements'].items()}
+        stats.varieties = Counter(dict(map(tuple, data['varieties'])))
+        stats.containers = Counter(dict(map(tuple, data['containers'])))
+        return stats
@@ -0,0 +1,1162 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+from contextlib import closing
+from dataclasses import replace
+
+import profiling
+from images import BlobStore, PHOTOS_DIR, is_blob_ref
+from index import GardenIndex
+from records import Note, Plant, iso_day
+from stats import GardenStats
+
+try:
+    import fcntl
+except ImportError:
+    # Windows : pas de verrou entre processus, seulement entre les threads du processus
+    fcntl = None
+
+PLANTS_FILE = 'garden_plants.json'
+NOTES_FILE = 'garden_notes.json'
+NOTES_LOG_FILE = 'garden_notes.log.jsonl'
+SQLITE_FILE = 'garden.db'
+NOTES_DIR = 'garden_notes'
+MANIFEST_FILE = 'manifest.json'
+NOTE_IDS_FILE = 'ids.log.jsonl'
+
+# Taille du journal des notes au-delà de laquelle il est fusionné dans l'instantané
+LOG_COMPACT_BYTES = 1024 * 1024
+
+# Un verrou par journal : les sessions Streamlit écrivent depuis des threads différents, et
+# d'autres processus (service d'ingestion, migration) peuvent écrire le même journal
+_log_locks = {}
+_compacting = set()
+
+# Instantanés partagés par toutes les sessions du processus : (moteur, dossier) -> GardenStore,
+# du moins récemment utilisé au plus récent ; au-delà de SHARED_GARDENS jardins, le plus ancien
+# est oublié (il sera relu depuis ses fichiers s'il est rouvert)
+SHARED_GARDENS = int(os.environ.get('GARDEN_CACHE_SIZE', 8))
+_shared_stores = OrderedDict()
+_shared_lock = threading.RLock()
+_attach_lock = threading.Lock()
+
+# Manifestes et tables des IDs relus seulement quand leur fichier change : chemin -> (empreinte, contenu)
+_partition_cache = {}
+
+# Les agrégats des statistiques sont réenregistrés au plus une fois par intervalle (secondes)
+STATS_SAVE_INTERVAL = 60
+_stats_saved_at = {}
+
+
+class FileLock:
+    """Verrou exclusif entre les threads du processus et, par flock(), entre les processus
+
+    Le fichier de verrou est créé à côté des données qu'il protège ; il ne contient rien.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._thread_lock = threading.Lock()
+        self._fd = None
+
+    def acquire(self, blocking=True):
+        if not self._thread_lock.acquire(blocking):
+            return False
+        if fcntl is None:
+            return True
+        try:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                self._thread_lock.release()
+                return False
+        except BaseException:
+            self._thread_lock.release()
+            raise
+        self._fd = fd
+        return True
+
+    def release(self):
+        if self._fd is not None:
+            fd, self._fd = self._fd, None
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+        self._thread_lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+def file_lock(path):
+    """Verrou d'un fichier de données, le même pour tous les moteurs du processus qui l'utilisent"""
+    path = os.path.abspath(path + '.lock')
+    return _log_locks.setdefault(path, FileLock(path))
+
+
+def file_signature(*paths):
+    """Empreinte (date de modification, taille) de fichiers, pour détecter qu'ils ont changé"""
+    signature = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            signature.append((stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            signature.append(None)
+    return tuple(signature)
+
+
+def read_json(path, default):
+    """Lire un fichier JSON s'il existe"""
+    if not os.path.exists(path):
+        return default
+    with open(path, 'r', encoding='utf-8') as f:
+        profiling.count('bytes_read', os.fstat(f.fileno()).st_size)
+        return json.load(f)
+
+
+def _fsync_write(path, payload):
+    # Nom temporaire propre à l'écrivain : deux écritures simultanées ne se volent pas leur fichier
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    profiling.count('bytes_written', len(payload))
+
+
+def write_json(path, data):
+    """Écrire un fichier JSON de façon atomique et renvoyer le nombre d'octets écrits"""
+    payload = json.dumps(data, ensure_ascii=False).encode('utf-8')
+    # Le remplacement est atomique : un crash ne laisse jamais un fichier à moitié écrit
+    _fsync_write(path, payload)
+    return len(payload)
+
+
+def append_log(path, entries):
+    """Ajouter des entrées en fin de journal (une ligne JSON chacune) et renvoyer les octets écrits"""
+    payload = ''.join(json.dumps(entry, ensure_ascii=False) + '\n' for entry in entries).encode('utf-8')
+    with open(path, 'a+b') as f:
+        # Une ligne incomplète laissée par un crash ne doit pas absorber la nouvelle entrée
+        size = f.seek(0, os.SEEK_END)
+        if size:
+            f.seek(size - 1)
+            if f.read(1) != b'\n':
+                payload = b'\n' + payload
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    profiling.count('bytes_written', len(payload))
+    return len(payload)
+
+
+def replay_log(notes, path, end=None):
+    """Rejouer les ajouts et suppressions du journal sur l'instantané des notes"""
+    if not os.path.exists(path):
+        return notes
+    by_id = {note['id']: note for note in notes}
+    with open(path, 'rb') as f:
+        data = f.read() if end is None else f.read(end)
+    profiling.count('bytes_read', len(data))
+    for line in data.splitlines():
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            # Ligne incomplète (écriture interrompue) : l'historique précédent reste intact
+            continue
+        if entry['op'] == 'put':
+            by_id[entry['note']['id']] = entry['note']
+        else:
+            by_id.pop(entry['id'], None)
+    return list(by_id.values())
+
+
+def apply_changes(records, changes, collection):
+    """Rejouer des modifications en attente sur une liste d'enregistrements"""
+    for change_collection, op, payload in changes:
+        if collection == 'notes' and change_collection == 'plants' and op == 'delete':
+            # La suppression d'une plante entraîne celle de ses notes
+            records = [r for r in records if r.plant_id != payload]
+        elif change_collection != collection:
+            continue
+        elif op == 'put':
+            # Un enregistrement modifié garde sa place, un nouvel enregistrement est ajouté à la fin
+            records = list(records)
+            i = next((i for i, r in enumerate(records) if r.id == payload.id), None)
+            if i is None:
+                records.append(payload)
+            else:
+                records[i] = payload
+        else:
+            records = [r for r in records if r.id != payload]
+    return records
+
+
+def in_window(note, start=None, end=None):
+    """La note est-elle datée de start à end ? (numéros de jour inclus, None = sans borne)"""
+    return (start is None or note.day >= start) and (end is None or note.day <= end)
+
+
+def sort_notes(notes, limit=None, plant_id=None, offset=0, start=None, end=None):
+    """Trier des notes par date (les plus récentes d'abord), avec filtres optionnels (plante, période)"""
+    if plant_id:
+        notes = [note for note in notes if note.plant_id == plant_id]
+    if start is not None or end is not None:
+        notes = [note for note in notes if in_window(note, start, end)]
+    notes = sorted(notes, key=lambda x: (x.day, x.id), reverse=True)
+    return notes[offset:offset + limit] if limit else notes[offset:]
+
+
+class StorageBackend:
+    """Interface commune des moteurs de stockage du journal
+
+    Les moteurs renvoient et reçoivent des enregistrements typés (records.Plant, records.Note) ;
+    ils ne manipulent le format JSON qu'au moment de lire ou d'écrire leurs fichiers.
+    """
+
+    # Les notes peuvent-elles être interrogées sans tout charger en mémoire ?
+    lazy_notes = False
+
+    def load_plants(self):
+        raise NotImplementedError
+
+    def load_notes(self):
+        raise NotImplementedError
+
+    def commit(self, changes, plants, notes, base=None):
+        """Enregistrer les modifications et renvoyer (octets écrits, empreinte des fichiers)
+
+        base est l'empreinte des fichiers dont les données en mémoire sont issues. L'empreinte
+        renvoyée est prise sous le verrou d'écriture ; elle vaut None si un autre processus a écrit
+        depuis base : les fichiers contiennent alors plus que la mémoire, qu'il faut relire.
+        """
+        raise NotImplementedError
+
+    def signature(self):
+        """Empreinte des fichiers du journal (change à chaque écriture)"""
+        raise NotImplementedError
+
+    def recent_notes(self, limit=None, plant_id=None, offset=0, start=None, end=None):
+        """Notes triées par date décroissante (implémentation par défaut : tout charger)
+
+        start et end limitent les notes à une période (numéros de jour inclus).
+        """
+        return sort_notes(self.load_notes(), limit, plant_id, offset, start, end)
+
+    def count_notes(self, plant_id=None, start=None, end=None):
+        """Nombre de notes, éventuellement pour une seule plante ou une période"""
+        return len(sort_notes(self.load_notes(), plant_id=plant_id, start=start, end=end))
+
+    def get_note(self, note_id):
+        """Récupérer une note par son ID"""
+        return next((n for n in self.load_notes() if n.id == note_id), None)
+
+    def image_in_use(self, digest):
+        """Indique si une photo est encore référencée par une plante ou une note"""
+        records = self.load_plants() + self.load_notes()
+        return any(record.image == digest for record in records)
+
+
+class JsonBackend(StorageBackend):
+    """Stockage dans des fichiers JSON : plantes, instantané des notes et journal des notes"""
+
+    def __init__(self, data_dir='.'):
+        self.data_dir = data_dir
+        self.plants_path = os.path.join(data_dir, PLANTS_FILE)
+        self.notes_path = os.path.join(data_dir, NOTES_FILE)
+        self.log_path = os.path.join(data_dir, NOTES_LOG_FILE)
+        self.lock = file_lock(self.log_path)
+        # Une seule fusion du journal à la fois, tous processus confondus
+        self.compact_lock = file_lock(self.notes_path)
+
+    def load_plants(self):
+        return [Plant.from_dict(plant) for plant in read_json(self.plants_path, [])]
+
+    def signature(self):
+        return file_signature(self.plants_path, self.notes_path, self.log_path)
+
+    def load_notes(self):
+        # Instantané + journal des modifications depuis la dernière fusion
+        with self.lock:
+            notes = replay_log(read_json(self.notes_path, []), self.log_path)
+        return [Note.from_dict(note) for note in notes]
+
+    def commit(self, changes, plants, notes, base=None):
+        written = 0
+        entries = [{'op': 'put', 'note': payload.to_dict()} if op == 'put' else {'op': 'delete', 'id': payload}
+                   for collection, op, payload in changes if collection == 'notes']
+        with self.lock:
+            unchanged = base is not None and self.signature() == base
+            # Le fichier des plantes (petit) est relu sous le verrou et réécrit en entier s'il a changé :
+            # les plantes ajoutées entre-temps par une autre session ou un autre processus sont conservées
+            if any(collection == 'plants' for collection, _, _ in changes):
+                plants = apply_changes(self.load_plants(), changes, 'plants')
+                written += write_json(self.plants_path, [plant.to_dict() for plant in plants])
+
+            # Les notes ne coûtent qu'un ajout en fin de journal et un fsync
+            if entries:
+                written += append_log(self.log_path, entries)
+                log_size = os.path.getsize(self.log_path)
+            signature = self.signature() if unchanged else None
+        if entries and log_size > LOG_COMPACT_BYTES:
+            self.compact_in_background()
+        return written, signature
+
+    def compact_in_background(self):
+        """Lancer la fusion du journal dans un thread, sans bloquer l'exécution en cours"""
+        with self.lock:
+            if self.log_path in _compacting:
+                return
+            _compacting.add(self.log_path)
+        threading.Thread(target=self.compact, daemon=True).start()
+
+    def compact(self):
+        """Fusionner le journal des notes dans l'instantané
+
+        L'instantané est remplacé de façon atomique avant que le journal ne soit raccourci :
+        après un crash entre les deux étapes, le journal est simplement rejoué une seconde fois
+        (les ajouts et suppressions sont idempotents). Les écritures continuent pendant la fusion ;
+        si un autre processus fusionne déjà ce journal, il n'y a rien à faire.
+        """
+        try:
+            if not self.compact_lock.acquire(blocking=False):
+                return
+            try:
+                with self.lock:
+                    if not os.path.exists(self.log_path):
+                        return
+                    offset = os.path.getsize(self.log_path)
+                    notes = read_json(self.notes_path, [])
+
+                write_json(self.notes_path, replay_log(notes, self.log_path, offset))
+
+                # Les entrées ajoutées pendant la fusion sont conservées dans le nouveau journal
+                with self.lock:
+                    with open(self.log_path, 'rb') as f:
+                        f.seek(offset)
+                        tail = f.read()
+                    _fsync_write(self.log_path, tail)
+            finally:
+                self.compact_lock.release()
+        finally:
+            _compacting.discard(self.log_path)
+
+
+class SqliteBackend(StorageBackend):
+    """Stockage SQLite indexé, avec écritures transactionnelles enregistrement par enregistrement"""
+
+    lazy_notes = True
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS plants (
+            id TEXT PRIMARY KEY,
+            date TEXT,
+            image TEXT,
+            data TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS notes (
+            id TEXT PRIMARY KEY,
+            plantId TEXT NOT NULL,
+            date TEXT NOT NULL,
+            image TEXT,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_plants_date ON plants(date);
+        CREATE INDEX IF NOT EXISTS idx_notes_plant ON notes(plantId, date);
+        CREATE INDEX IF NOT EXISTS idx_notes_date ON notes(date);
+        CREATE INDEX IF NOT EXISTS idx_notes_image ON notes(image);
+    """
+
+    def __init__(self, data_dir='.', filename=SQLITE_FILE):
+        self.data_dir = data_dir
+        self.path = os.path.join(data_dir, filename)
+        # SQLite libère son verrou à la fin de la transaction : l'empreinte est prise sous celui-ci
+        self.lock = file_lock(self.path)
+        with closing(self.connect()) as conn:
+            conn.executescript(self.SCHEMA)
+
+    def connect(self):
+        # Une connexion par opération : Streamlit exécute les sessions dans des threads différents
+        return sqlite3.connect(self.path)
+
+    def signature(self):
+        return file_signature(self.path, self.path + '-wal')
+
+    def _query(self, sql, params=(), record=Note):
+        with closing(self.connect()) as conn:
+            return [record.from_dict(json.loads(row[0])) for row in conn.execute(sql, params)]
+
+    def load_plants(self):
+        return self._query("SELECT data FROM plants", record=Plant)
+
+    def load_notes(self):
+        return self._query("SELECT data FROM notes")
+
+    @staticmethod
+    def _where(plant_id=None, start=None, end=None):
+        """Clause WHERE des filtres par plante et par période (servie par les index plantId/date)"""
+        conditions = []
+        params = []
+        if plant_id:
+            conditions.append("plantId = ?")
+            params.append(plant_id)
+        if start is not None:
+            conditions.append("date >= ?")
+            params.append(iso_day(start))
+        if end is not None:
+            conditions.append("date <= ?")
+            params.append(iso_day(end))
+        return (" WHERE " + " AND ".join(conditions) if conditions else ""), params
+
+    def recent_notes(self, limit=None, plant_id=None, offset=0, start=None, end=None):
+        where, params = self._where(plant_id, start, end)
+        sql = "SELECT data FROM notes" + where + " ORDER BY date DESC, id DESC LIMIT ? OFFSET ?"
+        return self._query(sql, params + [limit or -1, offset])
+
+    def count_notes(self, plant_id=None, start=None, end=None):
+        where, params = self._where(plant_id, start, end)
+        with closing(self.connect()) as conn:
+            return conn.execute("SELECT COUNT(*) FROM notes" + where, params).fetchone()[0]
+
+    def get_note(self, note_id):
+        notes = self._query("SELECT data FROM notes WHERE id = ?", (note_id,))
+        return notes[0] if notes else None
+
+    def image_in_use(self, digest):
+        with closing(self.connect()) as conn:
+            for table in ('plants', 'notes'):
+                if conn.execute(f"SELECT 1 FROM {table} WHERE image = ? LIMIT 1", (digest,)).fetchone():
+                    return True
+        return False
+
+    def insert_plants(self, conn, plants):
+        """Insérer ou remplacer des plantes dans une transaction ouverte"""
+        rows = [(p.id, p.date, p.image, json.dumps(p.to_dict(), ensure_ascii=False)) for p in plants]
+        conn.executemany("INSERT OR REPLACE INTO plants (id, date, image, data) VALUES (?, ?, ?, ?)", rows)
+        return sum(len(row[-1].encode('utf-8')) for row in rows)
+
+    def insert_notes(self, conn, notes):
+        """Insérer ou remplacer des notes dans une transaction ouverte"""
+        rows = [(n.id, n.plant_id, n.date, n.image, json.dumps(n.to_dict(), ensure_ascii=False))
+                for n in notes]
+        conn.executemany("INSERT OR REPLACE INTO notes (id, plantId, date, image, data) VALUES (?, ?, ?, ?, ?)", rows)
+        return sum(len(row[-1].encode('utf-8')) for row in rows)
+
+    def commit(self, changes, plants, notes, base=None):
+        written = 0
+        with self.lock, closing(self.connect()) as conn:
+            unchanged = base is not None and self.signature() == base
+            # Toutes les modifications sont appliquées dans une seule transaction
+            with conn:
+                for collection, op, payload in changes:
+                    if op == 'put' and collection == 'plants':
+                        written += self.insert_plants(conn, [payload])
+                    elif op == 'put':
+                        written += self.insert_notes(conn, [payload])
+                    elif collection == 'plants':
+                        conn.execute("DELETE FROM notes WHERE plantId = ?", (payload,))
+                        conn.execute("DELETE FROM plants WHERE id = ?", (payload,))
+                    else:
+                        conn.execute("DELETE FROM notes WHERE id = ?", (payload,))
+            signature = self.signature() if unchanged else None
+        return written, signature
+
+
+def partition_key(note):
+    """Partition d'une note : sa plante et le mois de sa date (« <plantId>/AAAA-MM »)"""
+    return f"{note.plant_id}/{note.date[:7]}"
+
+
+class PartitionedBackend(StorageBackend):
+    """Notes réparties en petits fichiers JSON par plante et par mois, décrits par un manifeste
+
+    Le manifeste donne, pour chaque partition, son nombre de notes et les photos qu'elle référence :
+    une page ne lit que les partitions qu'elle affiche et une écriture ne réécrit que les
+    partitions modifiées. Une table des IDs (journal d'ajouts) indique où se trouve chaque note.
+    Le manifeste est écrit en dernier ; rebuild() le reconstruit à partir des partitions.
+    """
+
+    lazy_notes = True
+
+    def __init__(self, data_dir='.'):
+        self.data_dir = data_dir
+        self.plants_path = os.path.join(data_dir, PLANTS_FILE)
+        self.root = os.path.join(data_dir, NOTES_DIR)
+        self.manifest_path = os.path.join(self.root, MANIFEST_FILE)
+        self.ids_path = os.path.join(self.root, NOTE_IDS_FILE)
+        self.lock = file_lock(self.root)
+
+    def partition_path(self, key):
+        plant_id, month = key.split('/')
+        return os.path.join(self.root, plant_id, f"{month}.json")
+
+    def signature(self):
+        return file_signature(self.plants_path, self.manifest_path, self.ids_path)
+
+    def _cached(self, path, load):
+        signature = file_signature(path)
+        cached = _partition_cache.get(path)
+        if cached is None or cached[0] != signature:
+            cached = _partition_cache[path] = (signature, load())
+        return cached[1]
+
+    def _update_cache(self, path, value):
+        """Mémoriser ce qui vient d'être écrit, pour ne pas relire le fichier à la prochaine requête"""
+        _partition_cache[path] = (file_signature(path), value)
+
+    def manifest(self):
+        """Partitions existantes : clé -> {'count': nombre de notes, 'images': {photo: nombre}}"""
+        if not os.path.exists(self.manifest_path) and os.path.isdir(self.root):
+            self.rebuild()
+        return self._cached(self.manifest_path, lambda: read_json(self.manifest_path, {}))
+
+    def note_ids(self):
+        """Table ID de note -> clé de partition"""
+        return self._cached(self.ids_path, self._load_note_ids)[0]
+
+    def _load_note_ids(self):
+        """Rejouer la table des IDs ; renvoie aussi le nombre de lignes, pour décider de la compacter"""
+        if not os.path.exists(self.ids_path):
+            return {}, 0
+        with open(self.ids_path, 'r', encoding='utf-8') as f:
+            lines = f.read().splitlines()
+        try:
+            # Un seul décodage pour tout le fichier
+            entries = json.loads('[' + ','.join(lines) + ']')
+        except ValueError:
+            # Ligne incomplète (écriture interrompue) : décodage ligne par ligne en l'ignorant
+            entries = []
+            for line in lines:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    continue
+        note_ids = {}
+        for note_id, key in entries:
+            if key:
+                note_ids[note_id] = key
+            else:
+                note_ids.pop(note_id, None)
+        return note_ids, len(lines)
+
+    def _write_note_ids(self, note_ids):
+        """Réécrire la table des IDs sans ses entrées périmées"""
+        payload = ''.join(json.dumps([note_id, key]) + '\n' for note_id, key in note_ids.items())
+        _fsync_write(self.ids_path, payload.encode('utf-8'))
+
+    def read_partition(self, key):
+        """Notes d'une partition, au format JSON du fichier"""
+        return read_json(self.partition_path(key), [])
+
+    def load_plants(self):
+        return [Plant.from_dict(plant) for plant in read_json(self.plants_path, [])]
+
+    def load_notes(self):
+        notes = []
+        for key in self.manifest():
+            notes.extend(map(Note.from_dict, self.read_partition(key)))
+        return notes
+
+    def _months(self, plant_id=None, start=None, end=None):
+        """Partitions groupées par mois, limitées à la plante et aux mois de la période
+
+        Renvoie aussi les mois coupés par les bornes de la période : le manifeste ne dit pas
+        combien de leurs notes s'y trouvent.
+        """
+        first = iso_day(start)[:7] if start is not None else None
+        last = iso_day(end)[:7] if end is not None else None
+        months = {}
+        for key in self.manifest():
+            month = key[-7:]
+            if plant_id and not key.startswith(plant_id + '/'):
+                continue
+            if (first and month < first) or (last and month > last):
+                continue
+            months.setdefault(month, []).append(key)
+        return months, {first, last} - {None}
+
+    def _read_months(self, keys, start=None, end=None):
+        notes = []
+        for key in keys:
+            notes.extend(map(Note.from_dict, self.read_partition(key)))
+        if start is not None or end is not None:
+            notes = [note for note in notes if in_window(note, start, end)]
+        return notes
+
+    def recent_notes(self, limit=None, plant_id=None, offset=0, start=None, end=None):
+        manifest = self.manifest()
+        # Partitions groupées par mois : toutes les notes d'un mois sont plus récentes que celles du précédent
+        months, partial = self._months(plant_id, start, end)
+
+        notes = []
+        for month in sorted(months, reverse=True):
+            keys = months[month]
+            count = sum(manifest[key]['count'] for key in keys)
+            # Les mois entièrement situés avant la fenêtre demandée ne sont pas lus
+            if not notes and month not in partial and offset >= count:
+                offset -= count
+                continue
+            notes.extend(self._read_months(keys, start, end))
+            if limit and len(notes) >= offset + limit:
+                break
+        return sort_notes(notes, limit, offset=offset)
+
+    def count_notes(self, plant_id=None, start=None, end=None):
+        manifest = self.manifest()
+        months, partial = self._months(plant_id, start, end)
+        # Seuls les mois coupés par la période sont lus ; les autres sont comptés d'après le manifeste
+        return sum(len(self._read_months(keys, start, end)) if month in partial
+                   else sum(manifest[key]['count'] for key in keys)
+                   for month, keys in months.items())
+
+    def get_note(self, note_id):
+        key = self.note_ids().get(note_id)
+        if key is None:
+            return None
+        note = next((note for note in self.read_partition(key) if note['id'] == note_id), None)
+        return Note.from_dict(note) if note else None
+
+    def image_in_use(self, digest):
+        if any(plant.image == digest for plant in self.load_plants()):
+            return True
+        return any(digest in entry.get('images', ()) for entry in self.manifest().values())
+
+    @staticmethod
+    def _manifest_entry(notes):
+        entry = {'count': len(notes)}
+        images = Counter(note['image'] for note in notes if note.get('image'))
+        if images:
+            entry['images'] = dict(images)
+        return entry
+
+    def _write_partition(self, manifest, key, notes):
+        """Réécrire une partition (ou la supprimer si elle est vide) et mettre à jour son entrée"""
+        path = self.partition_path(key)
+        if not notes:
+            manifest.pop(key, None)
+            try:
+                os.remove(path)
+                os.rmdir(os.path.dirname(path))
+            except OSError:
+                pass
+            return 0
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        manifest[key] = self._manifest_entry(notes)
+        return write_json(path, sorted(notes, key=lambda n: (n['date'], n['id'])))
+
+    def commit(self, changes, plants, notes, base=None):
+        written = 0
+        with self.lock:
+            unchanged = base is not None and self.signature() == base
+            # Plantes relues sous le verrou, comme le manifeste : seules nos modifications y sont appliquées
+            if any(collection == 'plants' for collection, _, _ in changes):
+                plants = apply_changes(self.load_plants(), changes, 'plants')
+                written += write_json(self.plants_path, [plant.to_dict() for plant in plants])
+
+            # Manifeste et table des IDs relus sous le verrou : un autre processus a pu les modifier
+            # Les objets en cache sont partagés : on travaille sur des copies
+            manifest = dict(self.manifest())
+            note_ids, lines = self._cached(self.ids_path, self._load_note_ids)
+            partitions = {}
+            # ID -> nouvelle partition (None : note supprimée)
+            moved = {}
+
+            def partition(key):
+                if key not in partitions:
+                    notes = self.read_partition(key) if key in manifest else []
+                    partitions[key] = {note['id']: note for note in notes}
+                return partitions[key]
+
+            for collection, op, payload in changes:
+                if collection == 'plants':
+                    if op == 'delete':
+                        # La suppression d'une plante vide toutes ses partitions
+                        prefix = payload + '/'
+                        for key in [k for k in set(manifest) | set(partitions) if k.startswith(prefix)]:
+                            moved.update(dict.fromkeys(partition(key)))
+                            partitions[key] = {}
+                    continue
+                note_id = payload.id if op == 'put' else payload
+                old_key = moved[note_id] if note_id in moved else note_ids.get(note_id)
+                if old_key:
+                    partition(old_key).pop(note_id, None)
+                moved[note_id] = partition_key(payload) if op == 'put' else None
+                if op == 'put':
+                    partition(moved[note_id])[note_id] = payload.to_dict()
+
+            # Seules les partitions modifiées sont réécrites
+            for key, records in partitions.items():
+                written += self._write_partition(manifest, key, list(records.values()))
+            entries = [[note_id, key] for note_id, key in moved.items() if note_ids.get(note_id) != key]
+            if entries:
+                written += append_log(self.ids_path, entries)
+                lines += len(entries)
+                note_ids = dict(note_ids)
+                for note_id, key in entries:
+                    if key:
+                        note_ids[note_id] = key
+                    else:
+                        note_ids.pop(note_id, None)
+                # Table des IDs compactée quand les entrées périmées deviennent majoritaires
+                if lines > 2 * len(note_ids) + 1000:
+                    self._write_note_ids(note_ids)
+                    lines = len(note_ids)
+                self._update_cache(self.ids_path, (note_ids, lines))
+            os.makedirs(self.root, exist_ok=True)
+            written += write_json(self.manifest_path, manifest)
+            self._update_cache(self.manifest_path, manifest)
+            signature = self.signature() if unchanged else None
+        return written, signature
+
+    def replace_all(self, plants, notes):
+        """Remplacer tout le contenu (migration) et renvoyer le nombre d'octets écrits"""
+        by_partition = {}
+        for note in notes:
+            by_partition.setdefault(partition_key(note), []).append(note.to_dict())
+        return self.replace_partitions(plants, by_partition.items())
+
+    def replace_partitions(self, plants, partitions):
+        """Remplacer tout le contenu par des partitions (clé, notes JSON) lues une à une
+
+        Chaque partition n'est écrite qu'une fois et seule la partition en cours est gardée en
+        mémoire : la migration d'un gros journal passe par ici.
+        """
+        with self.lock:
+            for key in list(self.manifest()):
+                self._write_partition({}, key, [])
+            manifest = {}
+            written = 0
+            os.makedirs(self.root, exist_ok=True)
+            tmp_path = self.ids_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as ids:
+                for key, records in partitions:
+                    written += self._write_partition(manifest, key, records)
+                    ids.write(''.join(json.dumps([record['id'], key]) + '\n' for record in records))
+                ids.flush()
+                os.fsync(ids.fileno())
+            os.replace(tmp_path, self.ids_path)
+            written += write_json(self.manifest_path, manifest)
+            # Plantes en dernier : lors d'une migration, ce fichier est aussi la source, inchangée jusqu'ici
+            written += write_json(self.plants_path, [plant.to_dict() for plant in plants])
+        return written
+
+    def rebuild(self):
+        """Reconstruire le manifeste et la table des IDs à partir des fichiers de partitions"""
+        manifest = {}
+        note_ids = {}
+        for plant_id in sorted(os.listdir(self.root)):
+            plant_dir = os.path.join(self.root, plant_id)
+            if not os.path.isdir(plant_dir):
+                continue
+            for filename in sorted(os.listdir(plant_dir)):
+                if not filename.endswith('.json'):
+                    continue
+                key = f"{plant_id}/{filename[:-5]}"
+                notes = read_json(os.path.join(plant_dir, filename), [])
+                if notes:
+                    manifest[key] = self._manifest_entry(notes)
+                    note_ids.update((note['id'], key) for note in notes)
+        self._write_note_ids(note_ids)
+        write_json(self.manifest_path, manifest)
+
+
+BACKENDS = {
+    'json': JsonBackend,
+    'sqlite': SqliteBackend,
+    'partitioned': PartitionedBackend,
+}
+
+
+def open_backend(name=None, data_dir='.'):
+    """Ouvrir le moteur de stockage configuré (variable d'environnement GARDEN_BACKEND)"""
+    name = name or os.environ.get('GARDEN_BACKEND', 'json')
+    if name not in BACKENDS:
+        raise ValueError(f"Moteur de stockage inconnu : {name}")
+    return BACKENDS[name](data_dir)
+
+
+def _shared_key(backend):
+    return type(backend).__name__, os.path.abspath(backend.data_dir)
+
+
+def _remember_shared(key, store):
+    """Mémoriser l'instantané partagé d'un jardin et oublier les moins récemment utilisés"""
+    _shared_stores[key] = store
+    _shared_stores.move_to_end(key)
+    while len(_shared_stores) > max(1, SHARED_GARDENS):
+        _, evicted = _shared_stores.popitem(last=False)
+        forget_garden(evicted.backend.data_dir)
+
+
+def forget_garden(data_dir):
+    """Oublier les manifestes et tables des IDs en cache d'un dossier de données"""
+    root = os.path.join(os.path.abspath(data_dir), NOTES_DIR, '')
+    for path in list(_partition_cache):
+        if os.path.abspath(path).startswith(root):
+            _partition_cache.pop(path, None)
+
+
+class GardenStore:
+    """Plantes et notes du jardin, avec suivi des modifications à sauvegarder"""
+
+    def __init__(self, backend=None, plants=None, notes=None):
+        self.backend = backend or JsonBackend()
+        self.plants = plants if plants is not None else []
+        # Les notes ne sont chargées que si le moteur ne sait pas les interroger directement
+        self._notes = notes
+        # Index construit une fois par chargement, puis tenu à jour à chaque modification
+        self.index = GardenIndex(self.plants, notes)
+        # Modifications en attente : (collection, opération, enregistrement ou ID)
+        self.changes = []
+        # Photos détachées d'un enregistrement, à supprimer si plus personne ne les référence
+        self.released_images = set()
+        # Octets écrits depuis la dernière remise à zéro du compteur
+        self.bytes_written = 0
+        self.blobs = BlobStore(os.path.join(self.backend.data_dir, PHOTOS_DIR))
+        # Empreinte des fichiers correspondant aux données en mémoire
+        self.signature = None
+        # Les listes et l'index sont-ils partagés avec d'autres sessions (copie à la modification) ?
+        self._shared = False
+
+    @classmethod
+    def load(cls, backend=None):
+        """Charger les données depuis le moteur de stockage"""
+        backend = backend or open_backend()
+        signature = backend.signature()
+        notes = None if backend.lazy_notes else backend.load_notes()
+        store = cls(backend, backend.load_plants(), notes)
+        store.signature = signature
+        store.externalize_images()
+        return store
+
+    @classmethod
+    def open_shared(cls, backend=None):
+        """Ouvrir le journal à partir de l'instantané partagé par toutes les sessions du processus
+
+        L'instantané n'est relu que si les fichiers ont changé depuis son chargement. La session
+        reçoit une vue qui partage les listes et l'index, et ne les copie qu'à sa première modification.
+        """
+        backend = backend or open_backend()
+        key = _shared_key(backend)
+        with _shared_lock:
+            reference = _shared_stores.get(key)
+            if reference is None or reference.signature != backend.signature():
+                reference = cls.load(backend)
+                # Les anciennes photos base64 sont migrées une fois pour toutes les sessions
+                reference.flush()
+                reference._shared = True
+            _remember_shared(key, reference)
+            return reference.fork()
+
+    def fork(self):
+        """Nouvelle vue sur les mêmes données, copiées seulement en cas de modification"""
+        store = GardenStore.__new__(GardenStore)
+        store.__dict__.update(self.__dict__)
+        store.changes = []
+        store.released_images = set()
+        store.bytes_written = 0
+        store._shared = True
+        return store
+
+    def refresh(self):
+        """Reprendre l'instantané partagé si le journal a été modifié ailleurs (autre session, autre processus)"""
+        if self.changes or self.backend.signature() == self.signature:
+            return self
+        store = GardenStore.open_shared(self.backend)
+        store.bytes_written = self.bytes_written
+        return store
+
+    def publish(self, signature):
+        """Après une écriture, faire de l'état de cette session l'instantané partagé
+
+        signature est l'empreinte renvoyée par l'écriture : une écriture d'un autre processus juste
+        après la nôtre n'y figure pas, et sera relue par refresh(). Si un autre processus avait écrit
+        avant nous (signature None), refresh() relit le journal complet.
+        """
+        self.signature = signature
+        with _shared_lock:
+            _remember_shared(_shared_key(self.backend), self.fork())
+        self._shared = True
+
+    def _own(self):
+        """Copier les listes et l'index partagés avant une modification (copie à l'écriture)"""
+        if not self._shared:
+            return
+        self.plants = list(self.plants)
+        if self._notes is not None:
+            self._notes = list(self._notes)
+        self.index = self.index.copy()
+        self._shared = False
+
+    def externalize_images(self):
+        """Sortir les photos base64 intégrées (ancien format) des enregistrements chargés
+
+        Une photo illisible reste telle quelle dans son enregistrement : elle ne doit pas empêcher
+        le chargement du journal.
+        """
+        for plant in list(self.plants):
+            digest = self._externalize(plant.id, plant.image)
+            if digest:
+                self.update_plant(plant.id, image=digest)
+        for note in list(self._notes or []):
+            digest = self._externalize(note.id, note.image)
+            if digest:
+                self.update_note(note.id, image=digest)
+
+    def _externalize(self, record_id, image):
+        if not (isinstance(image, str) and image.startswith('data:')):
+            return None
+        try:
+            return self.blobs.externalize(image)
+        except (ValueError, IndexError) as e:
+            print(f"Photo intégrée illisible ({record_id}), conservée telle quelle: {str(e)}")
+            return None
+
+    @property
+    def notes(self):
+        """Toutes les notes (chargées à la première demande)"""
+        if self._notes is None:
+            self._own()
+            self._notes = apply_changes(self.backend.load_notes(), self.changes, 'notes')
+            self.index.index_notes(self._notes)
+        return self._notes
+
+    @property
+    def dirty(self):
+        """Indique s'il reste des modifications non sauvegardées"""
+        return bool(self.changes)
+
+    def get_plant(self, plant_id):
+        """Récupérer une plante par son ID"""
+        return self.index.plants_by_id.get(plant_id)
+
+    def get_note(self, note_id):
+        """Récupérer une note par son ID"""
+        if not self.index.notes_indexed:
+            if not self.changes:
+                return self.backend.get_note(note_id)
+            self.notes
+        return self.index.notes_by_id.get(note_id)
+
+    def recent_plants(self, limit=None):
+        """Plantes triées par date de plantation (les plus récentes d'abord)"""
+        return self.index.recent_plants(limit)
+
+    def recent_notes(self, limit=None, plant_id=None, offset=0, start=None, end=None):
+        """Notes triées par date (les plus récentes d'abord), éventuellement pour une seule plante
+
+        start et end limitent les notes à une période (numéros de jour inclus, None = sans borne).
+        """
+        if not self.index.notes_indexed:
+            if not self.changes:
+                return self.backend.recent_notes(limit, plant_id, offset, start, end)
+            self.notes
+        return self.index.recent_notes(limit, plant_id, offset, start, end)
+
+    def count_notes(self, plant_id=None, start=None, end=None):
+        """Nombre de notes, éventuellement pour une seule plante ou une période"""
+        if not self.index.notes_indexed:
+            if not self.changes:
+                return self.backend.count_notes(plant_id, start, end)
+            self.notes
+        return self.index.count_notes(plant_id, start, end)
+
+    @property
+    def stats(self):
+        """Agrégats des statistiques : relus du disque ou calculés une fois, puis tenus à jour"""
+        if self.index.stats is None:
+            stats = None
+            if not self.changes:
+                stats = GardenStats.load(self.backend.data_dir, self.signature)
+            if stats is None:
+                notes = self._notes
+                if notes is None:
+                    notes = apply_changes(self.backend.load_notes(), self.changes, 'notes')
+                stats = GardenStats.build(self.plants, notes)
+                if not self.changes:
+                    self._save_stats(stats)
+            # L'index est partagé : les agrégats profitent à toutes les sessions
+            self.index.stats = stats
+        return self.index.stats
+
+    def _save_stats(self, stats):
+        # Journal modifié par un autre processus depuis le chargement : les agrégats sont incomplets
+        if self.signature is None:
+            return
+        try:
+            stats.save(self.backend.data_dir, self.signature)
+            _stats_saved_at[os.path.abspath(self.backend.data_dir)] = time.monotonic()
+        except OSError as e:
+            print(f"Erreur lors de l'enregistrement des statistiques: {str(e)}")
+
+    def search_plants(self, query):
+        """Plantes dont le nom, la variété, le terreau, l'emplacement ou les notes correspondent à la recherche"""
+        ids = self.index.search_plants(query)
+        if ids is None:
+            return self.plants
+        return [plant for plant in self.plants if plant.id in ids]
+
+    def search_notes(self, query, plant_id=None, start=None, end=None):
+        """Observations correspondant à la recherche, les plus récentes d'abord"""
+        # La recherche porte sur toutes les observations : elles sont chargées au besoin
+        self.notes
+        ids = self.index.search_notes(query)
+        if ids is None:
+            return self.recent_notes(plant_id=plant_id, start=start, end=end)
+        notes = [self.index.notes_by_id[note_id] for note_id in ids]
+        return sort_notes(notes, plant_id=plant_id, start=start, end=end)
+
+    def latest_note(self, plant_id):
+        """Dernière note d'une plante"""
+        if self.index.notes_indexed:
+            return self.index.latest_notes.get(plant_id)
+        notes = self.recent_notes(1, plant_id)
+        return notes[0] if notes else None
+
+    def add_plant(self, plant):
+        """Ajouter une plante"""
+        self._own()
+        self.plants.append(plant)
+        self.index.add_plant(plant)
+        if self.index.stats:
+            self.index.stats.add_plant(plant)
+        self.changes.append(('plants', 'put', plant))
+
+    def update_plant(self, plant_id, **fields):
+        """Modifier les champs d'une plante"""
+        plant = self.get_plant(plant_id)
+        if plant is None:
+            return None
+        self._own()
+        self._release_image(plant, fields)
+        updated = replace(plant, **fields)
+        self.plants[self.plants.index(plant)] = updated
+        self.index.replace_plant(plant, updated)
+        if self.index.stats:
+            self.index.stats.replace_plant(plant, updated)
+        self.changes.append(('plants', 'put', updated))
+        return updated
+
+    def delete_plant(self, plant_id):
+        """Supprimer une plante et toutes ses notes"""
+        self._own()
+        plant = self.get_plant(plant_id)
+        if plant is None:
+            return
+        self._release_image(plant)
+        if self.index.stats:
+            self.index.stats.remove_plant(plant)
+        for note in self.recent_notes(plant_id=plant_id):
+            self._release_image(note)
+            if self._notes is not None:
+                self.changes.append(('notes', 'delete', note.id))
+        if self._notes is not None:
+            self._notes = [note for note in self._notes if note.plant_id != plant_id]
+        self.plants = [p for p in self.plants if p.id != plant_id]
+        self.index.remove_plant(plant_id)
+        self.changes.append(('plants', 'delete', plant_id))
+
+    def add_note(self, note):
+        """Ajouter une note"""
+        self._own()
+        if self._notes is not None:
+            self._notes.append(note)
+        self.index.add_note(note)
+        if self.index.stats:
+            self.index.stats.add_note(note)
+        self.changes.append(('notes', 'put', note))
+
+    def update_note(self, note_id, **fields):
+        """Modifier les champs d'une note"""
+        self._own()
+        note = self.get_note(note_id)
+        if note is None:
+            return None
+        self._release_image(note, fields)
+        updated = replace(note, **fields)
+        if self._notes is not None:
+            self._notes[self._notes.index(note)] = updated
+        self.index.remove_note(note_id)
+        self.index.add_note(updated)
+        if self.index.stats:
+            self.index.stats.remove_note(note)
+            self.index.stats.add_note(updated)
+        self.changes.append(('notes', 'put', updated))
+        return updated
+
+    def delete_note(self, note_id):
+        """Supprimer une note"""
+        self._own()
+        note = self.get_note(note_id)
+        self._release_image(note)
+        if note and self.index.stats:
+            self.index.stats.remove_note(note)
+        if self._notes is not None:
+            self._notes = [n for n in self._notes if n.id != note_id]
+        self.index.remove_note(note_id)
+        self.changes.append(('notes', 'delete', note_id))
+
+    def flush(self):
+        """Enregistrer les modifications en attente et renvoyer les octets écrits"""
+        if not self.changes:
+            return 0
+
+        # Le moteur JSON réécrit la collection entière : les notes doivent être en mémoire
+        notes = self._notes if self.backend.lazy_notes else self.notes
+        written, signature = self.backend.commit(self.changes, self.plants, notes, self.signature)
+
+        self.changes = []
+        self.bytes_written += written
+        self.collect_images()
+        self.publish(signature)
+
+        # Enregistrer les agrégats à jour de temps en temps, pour un démarrage sans recalcul
+        last_saved = _stats_saved_at.get(os.path.abspath(self.backend.data_dir), 0)
+        if self.index.stats and time.monotonic() - last_saved > STATS_SAVE_INTERVAL:
+            self._save_stats(self.index.stats)
+        return written
+
+    def _release_image(self, record, fields=None):
+        """Noter qu'un enregistrement supprimé ou modifié ne référence plus sa photo"""
+        if not record or not record.image:
+            return
+        if fields is None or ('image' in fields and fields['image'] != record.image):
+            self.released_images.add(record.image)
+
+    def image_in_use(self, digest):
+        """Indique si une photo est encore référencée par une plante ou une note"""
+        if self.index.image_refs[digest] > 0:
+            return True
+        if not self.index.notes_indexed:
+            return self.backend.image_in_use(digest)
+        return False
+
+    def collect_images(self):
+        """Supprimer du disque les photos qui ne sont plus référencées (après l'écriture)"""
+        for digest in self.released_images:
+            if is_blob_ref(digest) and not self.image_in_use(digest):
+                self.blobs.delete(digest)
+        self.released_images = set()
+
+
+def attach_image(backend, collection, record_id, digest):
+    """Rattacher une photo traitée en arrière-plan à sa plante ou à sa note"""
+    with _attach_lock:
+        store = GardenStore.open_shared(backend)
+        if collection == 'plants':
+            record = store.update_plant(record_id, image=digest)
+        else:
+            record = store.update_note(record_id, image=digest)
+        store.flush()
+        # La fiche a été supprimée entre-temps : la photo ne doit pas rester orpheline
+        if record is None and not store.image_in_use(digest):
+            store.blobs.delete(digest)